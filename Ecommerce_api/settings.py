@@ -54,6 +54,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "api.throttling.LoadSheddingMiddleware",
+    "api.cdn.CdnMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -89,12 +91,42 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.TokenAuthentication"
     ],
+    # JSON through orjson when it is installed, see api.renderers
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
     "PAGE_SIZE": 10,
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
         "rest_framework.filters.OrderingFilter",
     ],
+    # Token buckets per view `throttle_scope`, keyed by user (or IP when
+    # anonymous) and, with the "_ip" suffix, by IP
+    "DEFAULT_THROTTLE_CLASSES": [
+        "api.throttling.UserBucketThrottle",
+        "api.throttling.IPBucketThrottle",
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        "catalog": "300/min",
+        "catalog_ip": "600/min",
+        "search": "30/min",
+        "search_ip": "60/min",
+        "suggest": "600/min",
+        "suggest_ip": "1200/min",
+        "cart": "120/min",
+        "cart_ip": "600/min",
+        "checkout": "20/min",
+        "checkout_ip": "200/min",
+        "default": "120/min",
+        "default_ip": "600/min",
+    },
 }
 
 
@@ -170,6 +202,134 @@ CACHES = {
     }
 }
 
+# Idempotency-Key replay window and in-flight lock for order and cart writes
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+IDEMPOTENCY_LOCK_TIMEOUT = 30
+
+# Buffered product view / add-to-cart counters and trending score decay
+POPULARITY_FLUSH_INTERVAL = 60
+POPULARITY_BATCH_SIZE = 500
+POPULARITY_CART_WEIGHT = 5
+POPULARITY_HALF_LIFE = 60 * 60 * 24
+POPULARITY_MIN_SCORE = 0.01
+
+# Order side-effect outbox dispatched by `manage.py dispatch_outbox`; events a
+# dispatcher claimed but never finished are retried after OUTBOX_CLAIM_TIMEOUT
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_DELAY = 10
+OUTBOX_MAX_RETRY_DELAY = 60 * 60
+OUTBOX_CLAIM_TIMEOUT = 60 * 5
+
+# Carts behind /api/cart/ live in Redis until checkout; with CART_STORE = None
+# or a non-Redis cache they are the open OrderItem rows of /api/order-items/
+CART_STORE = "api.carts.RedisCartStore"
+CART_TTL = 60 * 60 * 24 * 7
+CART_STOCK_TTL = 30
+
+# Per-object cache of serialized products and the /api/products/batch/ size cap
+PRODUCT_CACHE_TTL = 60 * 5
+PRODUCT_BATCH_MAX = 100
+
+# Anonymous product and category lists are cached for their `cache_max_age`.
+# Concurrent misses of a key are computed once; other processes wait up to
+# SINGLE_FLIGHT_WAIT seconds for the one holding the lock
+SINGLE_FLIGHT_LOCK_TIMEOUT = 30
+SINGLE_FLIGHT_WAIT = 5
+
+# Requested from the app server at CACHE_WARM_ORIGIN by `manage.py warm_cache`,
+# and by the cache_warming job once the cache comes up empty. Lists are cached
+# per host, so CACHE_WARM_HOST must be the Host clients send
+CACHE_WARM_ORIGIN = os.getenv("CACHE_WARM_ORIGIN", "http://localhost:8000")
+CACHE_WARM_HOST = os.getenv("CACHE_WARM_HOST", "localhost")
+CACHE_WARM_TIMEOUT = 30
+CACHE_WARM_CONCURRENCY = 4
+CACHE_WARM_URLS = [
+    "/api/products/?featured=true",
+    "/api/products/?ordering=-stars",
+    "/api/products/?ordering=-datetime_created",
+    "/api/categories/?parent=none",
+]
+# Products put in the per-object cache, as queryset filters, ordering and limit
+CACHE_WARM_PRODUCTS = [
+    {"filter": {"featured": True}, "order_by": ["-trending"], "limit": 100},
+    {"filter": {}, "order_by": ["-trending"], "limit": 200},
+]
+
+# Most stock changes accepted by one POST /api/products/stock/
+STOCK_SYNC_MAX = 5000
+
+# Product and category name suggestions served from a prefix index. Prefixes
+# are indexed up to TYPEAHEAD_PREFIX_LENGTH characters; longer queries filter
+# the TYPEAHEAD_CANDIDATES most popular matches of their first characters
+TYPEAHEAD_MAX_LIMIT = 20
+TYPEAHEAD_PREFIX_LENGTH = 12
+TYPEAHEAD_CANDIDATES = 200
+
+# "Customers also bought" neighbours kept per product by `manage.py build_recommendations`,
+# counted RECOMMENDATIONS_BATCH_SIZE orders at a time. Orders completed in the last
+# RECOMMENDATIONS_SETTLE seconds wait for the next run, in case they commit late
+RECOMMENDATIONS_TOP_K = 10
+RECOMMENDATIONS_BATCH_SIZE = 1000
+RECOMMENDATIONS_SETTLE = 60 * 5
+
+# Periodic jobs run by `manage.py run_scheduler`. SCHEDULER_JOBS overrides a job's
+# interval, batch_size or time_budget by name, e.g. {"abandoned_carts": {"interval": 600}}.
+# A node holds a job for SCHEDULER_LEASE seconds, renewed while the job runs
+SCHEDULER_TICK = 5
+SCHEDULER_LEASE = 60 * 5
+SCHEDULER_JOBS = {}
+CART_ABANDON_AFTER = 60 * 60 * 24 * 30
+
+# Bulk user import by `manage.py import_users` and POST /api/users/import/. The
+# command hashes in USER_IMPORT_WORKERS processes (defaults to the CPU count),
+# the endpoint in the request's own process
+USER_IMPORT_BATCH_SIZE = 1000
+USER_IMPORT_MAX = 200
+USER_IMPORT_WORKERS = None
+
+# Cache-Control and surrogate keys on catalog responses; CDN_PURGER receives the
+# keys to invalidate when catalog rows change
+CDN_PURGER = "api.cdn.LogPurger"
+CDN_SURROGATE_KEY_HEADER = "Surrogate-Key"
+CDN_STALE_WHILE_REVALIDATE = 60 * 5
+CDN_STALE_IF_ERROR = 60 * 60 * 24
+
+# Completed orders older than this are moved to the archive tables
+ORDER_ARCHIVE_AFTER = 60 * 60 * 24 * 365
+ORDER_ARCHIVE_BATCH_SIZE = 500
+
+# Anonymous list requests of these throttle scopes get 503 while more than
+# LOAD_SHED_MAX_IN_FLIGHT requests are running, or a process's moving average
+# query time over the last LOAD_SHED_WINDOW seconds exceeds LOAD_SHED_DB_LATENCY.
+# Requests in flight are counted across processes in Redis, dropping counts
+# idle for LOAD_SHED_IN_FLIGHT_TTL seconds; with any other cache they are
+# counted per process, which needs threaded or async workers
+LOAD_SHED_SCOPES = ("catalog", "search")
+LOAD_SHED_MAX_IN_FLIGHT = 50
+LOAD_SHED_IN_FLIGHT_TTL = 60
+LOAD_SHED_DB_LATENCY = 0.25
+LOAD_SHED_SMOOTHING = 0.1
+LOAD_SHED_WINDOW = 10
+LOAD_SHED_RETRY_AFTER = 10
+
+# Throttle buckets kept per process when the cache is not Redis
+THROTTLE_LOCAL_MAX_BUCKETS = 10000
+
+# Sizes stored in the `srcset` of product and image rows when they are saved,
+# as IMAGE_VARIANT_BACKEND transformation options
+IMAGE_VARIANT_BACKEND = "api.images.CloudinaryBackend"
+IMAGE_VARIANTS = {
+    "thumbnail": {"width": 150, "height": 150, "crop": "fill"},
+    "card": {"width": 400, "height": 400, "crop": "fill"},
+    "zoom": {"width": 1600, "height": 1600, "crop": "limit"},
+}
+
+# Categories and vendors are held by every process and reloaded when another one
+# changes them, noticed within HOT_CACHE_CHECK_INTERVAL seconds, or every HOT_CACHE_TTL
+HOT_CACHE_CHECK_INTERVAL = 1
+HOT_CACHE_TTL = 60 * 5
+
 CORS_ORIGIN_ALLOW_ALL = True
 CORS_ALLOW_CREDENTIALS = True
 
@@ -1,5 +1,12 @@
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from api.models import (
+    ArchivedOrder,
     User,
     Order,
     OrderItem,
@@ -8,14 +15,183 @@ from api.models import (
     Product,
     Category,
     Review,
+    Vendor,
 )
 
-admin.site.register(User)
-admin.site.register(Order)
-admin.site.register(OrderItem)
-admin.site.register(Image)
-admin.site.register(Size)
-admin.site.register(Product)
-admin.site.register(Category)
-admin.site.register(Review)
+CURSOR_VAR = "cursor"
 
+# Unfiltered changelists on tables at least this big show the planner's row
+# estimate instead of running COUNT(*).
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+
+class EstimatedCountPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+
+        if not queryset.query.where and connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples FROM pg_class WHERE relname = %s",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= ESTIMATED_COUNT_THRESHOLD:
+                return int(row[0])
+        return super().count
+
+
+class CursorChangeList(ChangeList):
+    """
+    Changelist that pages by primary key when sorted by the default `-pk`
+    ordering. The "Next" link carries the last primary key on the page, so
+    deep pages use an index seek instead of OFFSET and skip the COUNT.
+    """
+
+    def get_filters_params(self, params=None):
+        params = super().get_filters_params(params)
+        params.pop(CURSOR_VAR, None)
+        return params
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        self.keyset = set(qs.query.order_by) == {"-pk"}
+        self.cursor = None
+
+        value = self.params.get(CURSOR_VAR, None)
+        if value and self.keyset:
+            try:
+                self.cursor = self.lookup_opts.pk.to_python(value)
+            except ValidationError as e:
+                raise IncorrectLookupParameters(e)
+            qs = qs.filter(pk__lt=self.cursor)
+        return qs
+
+    def get_results(self, request):
+        if self.cursor is None:
+            super().get_results(request)
+        else:
+            self.paginator = self.model_admin.get_paginator(
+                request, self.queryset, self.list_per_page
+            )
+            self.result_list = self.queryset[: self.list_per_page]
+            self.result_count = len(self.result_list)
+            self.full_result_count = None
+            self.show_full_result_count = False
+            self.show_admin_actions = True
+            self.can_show_all = False
+            self.multi_page = False
+
+        self.next_cursor_url = None
+        results = list(self.result_list)
+        if self.keyset and len(results) == self.list_per_page:
+            self.next_cursor_url = self.get_query_string(
+                {CURSOR_VAR: results[-1].pk}, [PAGE_VAR]
+            )
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    ordering = ("-pk",)
+
+    def get_changelist(self, request, **kwargs):
+        return CursorChangeList
+
+
+@admin.register(User)
+class UserAdmin(ScalableModelAdmin):
+    list_display = ("email", "first_name", "last_name", "is_vendor", "is_active")
+    list_filter = ("is_vendor", "is_active", "is_staff")
+    search_fields = ("^email",)
+    exclude = ("user_permissions",)
+    raw_id_fields = ("groups",)
+
+
+@admin.register(Vendor)
+class VendorAdmin(ScalableModelAdmin):
+    list_display = ("name", "user", "datetime_created")
+    list_select_related = ("user",)
+    search_fields = ("^name",)
+    autocomplete_fields = ("user",)
+
+
+@admin.register(Category)
+class CategoryAdmin(ScalableModelAdmin):
+    list_display = ("name", "parent")
+    list_select_related = ("parent",)
+    search_fields = ("^name",)
+    autocomplete_fields = ("parent",)
+
+
+@admin.register(Product)
+class ProductAdmin(ScalableModelAdmin):
+    list_display = ("id", "name", "price", "quantity", "category", "vendor", "is_available", "featured")
+    list_display_links = ("id", "name")
+    list_select_related = ("category", "vendor")
+    list_filter = ("is_available", "featured")
+    search_fields = ("^name",)
+    autocomplete_fields = ("category", "vendor", "parent")
+    raw_id_fields = ("customers",)
+
+
+@admin.register(Image)
+class ImageAdmin(ScalableModelAdmin):
+    list_display = ("id", "product")
+    list_select_related = ("product",)
+    autocomplete_fields = ("product",)
+
+
+@admin.register(Size)
+class SizeAdmin(ScalableModelAdmin):
+    list_display = ("id", "name", "product")
+    list_select_related = ("product",)
+    search_fields = ("^name",)
+    autocomplete_fields = ("product",)
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(ScalableModelAdmin):
+    list_display = ("id", "user", "product", "quantity")
+    list_select_related = ("user", "product")
+    autocomplete_fields = ("user", "product")
+
+
+@admin.register(Order)
+class OrderAdmin(ScalableModelAdmin):
+    list_display = ("id", "user", "datetime_created", "completed", "item_count", "total_amount")
+    list_select_related = ("user",)
+    list_filter = ("completed",)
+    autocomplete_fields = ("user",)
+    raw_id_fields = ("items",)
+    readonly_fields = ("item_count", "total_amount")
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Orders placed through the API snapshot their totals at checkout;
+        # orders edited here take them from their new lines.
+        if "items" in form.changed_data:
+            order = form.instance
+            items = list(order.items.select_related("product"))
+            order.item_count = sum(item.quantity for item in items)
+            order.total_amount = sum(item.get_total_amount() for item in items)
+            order.save(update_fields=["item_count", "total_amount"])
+
+
+@admin.register(Review)
+class ReviewAdmin(ScalableModelAdmin):
+    list_display = ("id", "user", "product", "stars")
+    list_select_related = ("user", "product")
+    autocomplete_fields = ("user", "product")
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(ScalableModelAdmin):
+    list_display = ("id", "user", "datetime_created", "item_count", "total_amount")
+    list_select_related = ("user",)
+    autocomplete_fields = ("user",)
+    raw_id_fields = ("items",)
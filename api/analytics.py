@@ -0,0 +1,219 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.db.models.signals import m2m_changed, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ArchivedOrder, Order, OrderItem, ProductDailySales, VendorDailySales
+
+
+def _increment(model, lookup, **amounts):
+    updates = {field: F(field) + value for field, value in amounts.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **amounts)
+    except IntegrityError:
+        model.objects.filter(**lookup).update(**updates)
+
+
+def record_sales(order, items, counted_vendors=()):
+    """
+    Add the given lines of a completed order to the daily rollups. Vendors in
+    `counted_vendors` already have this order in their order count.
+    """
+    day = timezone.localdate(order.datetime_created)
+    products = defaultdict(lambda: [0, 0])
+    vendors = defaultdict(lambda: [0, 0])
+
+    for item in items.select_related("product"):
+        product = item.product
+        revenue = item.get_total_amount()
+        products[(product.vendor_id, product.id)][0] += item.quantity
+        products[(product.vendor_id, product.id)][1] += revenue
+        vendors[product.vendor_id][0] += item.quantity
+        vendors[product.vendor_id][1] += revenue
+
+    with transaction.atomic():
+        for (vendor_id, product_id), (units, revenue) in products.items():
+            _increment(
+                ProductDailySales,
+                {"vendor_id": vendor_id, "product_id": product_id, "day": day},
+                units=units,
+                revenue=revenue,
+            )
+
+        for vendor_id, (units, revenue) in vendors.items():
+            _increment(
+                VendorDailySales,
+                {"vendor_id": vendor_id, "day": day},
+                orders=0 if vendor_id in counted_vendors else 1,
+                units=units,
+                revenue=revenue,
+            )
+
+
+def _sales(through, order, item):
+    """Product-day and vendor-day totals of the completed orders in an order/line table."""
+    lines = through.objects.filter(**{f"{order}__completed": True}).annotate(
+        day=TruncDate(f"{order}__datetime_created")
+    )
+    units = Sum(f"{item}__quantity")
+    # Lines ordered before prices were snapshotted fall back to today's price.
+    revenue = Sum(
+        F(f"{item}__quantity") * Coalesce(f"{item}__price", f"{item}__product__price")
+    )
+
+    products = lines.values(
+        "day",
+        product_id=F(f"{item}__product"),
+        vendor_id=F(f"{item}__product__vendor"),
+    ).annotate(total_units=units, total_revenue=revenue)
+
+    vendors = lines.values(
+        "day", vendor_id=F(f"{item}__product__vendor")
+    ).annotate(
+        total_orders=Count(order, distinct=True),
+        total_units=units,
+        total_revenue=revenue,
+    )
+    return products.order_by(), vendors.order_by()
+
+
+def rebuild_sales(batch_size=1000):
+    """Regenerate both rollup tables from the full completed order history, archive included."""
+    products = defaultdict(lambda: [0, 0])
+    vendors = defaultdict(lambda: [0, 0, 0])
+
+    for through, order, item in (
+        (Order.items.through, "order", "orderitem"),
+        (ArchivedOrder.items.through, "archivedorder", "archivedorderitem"),
+    ):
+        product_rows, vendor_rows = _sales(through, order, item)
+        for row in product_rows.iterator():
+            totals = products[(row["vendor_id"], row["product_id"], row["day"])]
+            totals[0] += row["total_units"]
+            totals[1] += row["total_revenue"]
+        for row in vendor_rows.iterator():
+            totals = vendors[(row["vendor_id"], row["day"])]
+            totals[0] += row["total_orders"]
+            totals[1] += row["total_units"]
+            totals[2] += row["total_revenue"]
+
+    with transaction.atomic():
+        ProductDailySales.objects.all().delete()
+        VendorDailySales.objects.all().delete()
+
+        _bulk_create(
+            ProductDailySales,
+            (
+                ProductDailySales(
+                    vendor_id=vendor_id,
+                    product_id=product_id,
+                    day=day,
+                    units=units,
+                    revenue=revenue,
+                )
+                for (vendor_id, product_id, day), (units, revenue) in products.items()
+            ),
+            batch_size,
+        )
+        _bulk_create(
+            VendorDailySales,
+            (
+                VendorDailySales(
+                    vendor_id=vendor_id,
+                    day=day,
+                    orders=orders,
+                    units=units,
+                    revenue=revenue,
+                )
+                for (vendor_id, day), (orders, units, revenue) in vendors.items()
+            ),
+            batch_size,
+        )
+
+
+def _bulk_create(model, objs, batch_size):
+    batch = []
+    for obj in objs:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+
+
+def vendor_report(vendor, start, end, top=10):
+    daily = VendorDailySales.objects.filter(
+        vendor=vendor, day__range=(start, end)
+    ).order_by("day")
+    top_products = (
+        ProductDailySales.objects.filter(vendor=vendor, day__range=(start, end))
+        .values("product")
+        .annotate(total_units=Sum("units"), total_revenue=Sum("revenue"))
+        .order_by("-total_revenue", "product")[:top]
+    )
+
+    days = [
+        {
+            "day": row.day,
+            "orders": row.orders,
+            "units": row.units,
+            "revenue": row.revenue,
+        }
+        for row in daily
+    ]
+    return {
+        "start": start,
+        "end": end,
+        "orders": sum(row["orders"] for row in days),
+        "units": sum(row["units"] for row in days),
+        "revenue": sum(row["revenue"] for row in days),
+        "daily": days,
+        "top_products": [
+            {
+                "product": row["product"],
+                "units": row["total_units"],
+                "revenue": row["total_revenue"],
+            }
+            for row in top_products
+        ],
+    }
+
+
+@receiver(pre_save, sender=Order)
+def flag_completed_order(sender, instance, raw, **kwargs):
+    if raw or not instance.completed:
+        return
+    instance._just_completed = instance._state.adding or sender.objects.filter(
+        pk=instance.pk, completed=False
+    ).exists()
+    if instance._just_completed and instance.datetime_completed is None:
+        instance.datetime_completed = timezone.now()
+
+
+@receiver(post_save, sender=Order)
+def record_completed_order(sender, instance, raw, **kwargs):
+    if getattr(instance, "_just_completed", False):
+        instance._just_completed = False
+        record_sales(instance, instance.items.all())
+
+
+@receiver(m2m_changed, sender=Order.items.through)
+def record_completed_order_items(sender, instance, action, reverse, pk_set, **kwargs):
+    if action != "post_add" or reverse or not instance.completed or not pk_set:
+        return
+
+    counted_vendors = set(
+        instance.items.exclude(pk__in=pk_set).values_list(
+            "product__vendor", flat=True
+        )
+    )
+    record_sales(instance, OrderItem.objects.filter(pk__in=pk_set), counted_vendors)
@@ -0,0 +1,148 @@
+import functools
+import heapq
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+
+def get_cutoff():
+    """Completed orders created before this are moved to the archive."""
+    return timezone.now() - timedelta(seconds=settings.ORDER_ARCHIVE_AFTER)
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Move up to `batch_size` of the oldest completed orders created before
+    `cutoff`, with their lines, into the archive tables in one transaction.
+    Rows locked by another archiver are skipped, and rows already in the
+    archive are kept as they are. Returns the orders moved.
+    """
+    with transaction.atomic():
+        ids = list(
+            Order.objects.select_for_update(skip_locked=True)
+            .filter(completed=True, datetime_created__lt=cutoff)
+            .order_by("datetime_created")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+
+        orders = Order.objects.with_totals().filter(pk__in=ids)
+        links = list(
+            Order.items.through.objects.filter(order__in=ids).values_list(
+                "order_id", "orderitem_id"
+            )
+        )
+        item_ids = {item_id for _, item_id in links}
+
+        ArchivedOrderItem.objects.bulk_create(
+            [
+                ArchivedOrderItem(
+                    id=item.id,
+                    user_id=item.user_id,
+                    quantity=item.quantity,
+                    product_id=item.product_id,
+                    datetime_updated=item.datetime_updated,
+                    price=item.price,
+                )
+                for item in OrderItem.objects.filter(pk__in=item_ids)
+            ],
+            ignore_conflicts=True,
+        )
+        ArchivedOrder.objects.bulk_create(
+            [
+                ArchivedOrder(
+                    id=order.id,
+                    datetime_created=order.datetime_created,
+                    user_id=order.user_id,
+                    completed=order.completed,
+                    datetime_completed=order.datetime_completed,
+                    item_count=order.total_items,
+                    total_amount=order.total,
+                )
+                for order in orders
+            ],
+            ignore_conflicts=True,
+        )
+        ArchivedOrder.items.through.objects.bulk_create(
+            [
+                ArchivedOrder.items.through(
+                    archivedorder_id=order_id, archivedorderitem_id=item_id
+                )
+                for order_id, item_id in links
+            ],
+            ignore_conflicts=True,
+        )
+
+        Order.objects.filter(pk__in=ids).delete()
+        OrderItem.objects.filter(pk__in=item_ids, order=None).delete()
+    return len(ids)
+
+
+def archive_orders(cutoff=None, batch_size=None, run=None):
+    """
+    Archive completed orders older than `cutoff` batch by batch, stopping
+    early when the scheduler `run` is out of budget. Each batch commits on
+    its own, so an interrupted run resumes from the oldest remaining order.
+    """
+    cutoff = cutoff or get_cutoff()
+    batch_size = batch_size or settings.ORDER_ARCHIVE_BATCH_SIZE
+    archived = 0
+
+    while True:
+        count = archive_batch(cutoff, batch_size)
+        archived += count
+        if count < batch_size or (run is not None and run.expired()):
+            break
+    return archived
+
+
+class MergedOrders:
+    """
+    Hot and archived orders matching the same filters, read as one sorted
+    sequence. Slicing pulls at most `stop` rows from each queryset and merges
+    them, so `LimitOffsetPagination` can page across both tables.
+    """
+
+    def __init__(self, querysets, ordering):
+        self.ordering = list(ordering)
+        if not {field.lstrip("-") for field in self.ordering} & {"pk", "id"}:
+            self.ordering.append("pk")
+        self.querysets = [queryset.order_by(*self.ordering) for queryset in querysets]
+
+    def compare(self, a, b):
+        for field in self.ordering:
+            name = field.lstrip("-")
+            x, y = getattr(a, name), getattr(b, name)
+            if x != y:
+                result = -1 if x < y else 1
+                return -result if field.startswith("-") else result
+        return 0
+
+    def merge(self, iterables):
+        return heapq.merge(*iterables, key=functools.cmp_to_key(self.compare))
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return self.merge(self.querysets)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index : index + 1][0]
+
+        start, stop = index.start or 0, index.stop
+        if stop is None:
+            return list(islice(self, start, None))
+        return list(
+            islice(self.merge(queryset[:stop] for queryset in self.querysets), start, stop)
+        )
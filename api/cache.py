@@ -0,0 +1,208 @@
+import functools
+import hashlib
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.response import Response
+
+from .models import Category, Image, Product, Size, Vendor
+
+
+def get_redis_client():
+    """
+    Return the redis-py client behind the default cache, or None when the
+    cache is not Redis (e.g. a local memory cache in development).
+    """
+    backend = caches["default"]
+    if not isinstance(backend, RedisCache):
+        return None
+    return backend._cache.get_client(write=True)
+
+
+_flights_lock = threading.Lock()
+_flights = {}
+
+
+def single_flight(key, compute, timeout):
+    """
+    Return the cached value of `key`, computing and caching it on a miss.
+    Concurrent misses compute it once: other threads of this process wait
+    for the first one's result, and other processes poll the cache while a
+    lock is held, for up to SINGLE_FLIGHT_WAIT seconds.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    with _flights_lock:
+        flight = _flights.get(key, None)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = Future()
+    if not leader:
+        return flight.result()
+
+    try:
+        value = _fill(key, compute, timeout)
+    except BaseException as e:
+        flight.set_exception(e)
+        raise
+    else:
+        flight.set_result(value)
+        return value
+    finally:
+        with _flights_lock:
+            del _flights[key]
+
+
+def _fill(key, compute, timeout):
+    lock_key = f"{key}:lock"
+    locked = cache.add(lock_key, 1, timeout=settings.SINGLE_FLIGHT_LOCK_TIMEOUT)
+    if not locked:
+        deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            value = cache.get(key)
+            if value is not None:
+                return value
+            # The holder failed or gave up without caching a value.
+            if cache.get(lock_key) is None:
+                break
+
+    try:
+        value = compute()
+        cache.set(key, value, timeout)
+        return value
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
+def list_version_key(model_name):
+    return f"list:version:{model_name}"
+
+
+def get_list_versions(model_names):
+    """The current list cache version of each model in `model_names`."""
+    keys = [list_version_key(name) for name in model_names]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, "") for key in keys]
+
+
+def bump_list_versions(model_names):
+    """Orphan every cached list that includes rows of `model_names`."""
+    cache.set_many(
+        {list_version_key(name): uuid.uuid4().hex for name in model_names}, timeout=None
+    )
+
+
+def list_key(view, request):
+    from .cdn import get_tagged_models
+
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    url = f"{request.scheme}://{request.get_host()}{request.path}?{query}"
+    model_names = get_tagged_models(view.serializer_class)
+    versions = ":".join(get_list_versions(model_names))
+    return f"list:{view.basename}:{hashlib.sha256(f'{versions}:{url}'.encode()).hexdigest()}"
+
+
+def cached_list(method):
+    """
+    Cache anonymous responses of a viewset's `list` for its
+    `cache_max_age["list"]` seconds, through `single_flight`. The key holds
+    the list versions of every model in the response, which `api.cdn.purge`
+    bumps along with the CDN purge.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.user and request.user.is_authenticated:
+            return method(self, request, *args, **kwargs)
+
+        data = single_flight(
+            list_key(self, request),
+            lambda: method(self, request, *args, **kwargs).data,
+            self.cache_max_age["list"],
+        )
+        return Response(data)
+
+    return wrapper
+
+
+def product_key(pk):
+    return f"product:{pk}"
+
+
+def get_cached_products(ids):
+    """Return {id: serialized product} for the ids found in the per-object cache."""
+    keys = {product_key(pk): pk for pk in ids}
+    return {keys[key]: data for key, data in cache.get_many(keys).items()}
+
+
+def cache_products(products):
+    cache.set_many(
+        {product_key(data["id"]): data for data in products},
+        timeout=settings.PRODUCT_CACHE_TTL,
+    )
+
+
+def invalidate_products(ids):
+    cache.delete_many([product_key(pk) for pk in ids])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def clear_product(sender, instance, **kwargs):
+    invalidate_products([instance.pk])
+
+
+def get_cleared_products(user):
+    """Ids of the products a user had before `user.users.clear()`, in "post_clear"."""
+    return getattr(user, "_cleared_products", [])
+
+
+@receiver(m2m_changed, sender=Product.customers.through)
+def clear_product_customers(sender, instance, action, reverse, pk_set, **kwargs):
+    # A user's products are gone by "post_clear", so they are read before.
+    if action == "pre_clear" and reverse:
+        instance._cleared_products = list(instance.users.values_list("id", flat=True))
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        invalidate_products([instance.pk])
+    elif pk_set:
+        invalidate_products(pk_set)
+    else:
+        invalidate_products(get_cleared_products(instance))
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+@receiver(post_save, sender=Size)
+@receiver(post_delete, sender=Size)
+def clear_product_children(sender, instance, **kwargs):
+    invalidate_products([instance.product_id])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Vendor)
+def clear_related_products(sender, instance, created, **kwargs):
+    if created:
+        return
+    field = "category" if sender is Category else "vendor"
+    invalidate_products(
+        Product.objects.filter(**{field: instance}).values_list("id", flat=True)
+    )
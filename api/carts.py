@@ -0,0 +1,395 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Sum
+from django.http import Http404
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.serializers import ValidationError
+
+from . import popularity
+from .cache import get_redis_client
+from .models import OrderItem, Product, User
+
+
+logger = logging.getLogger(__name__)
+
+# Adds ARGV[2] units of product ARGV[1] to the cart KEYS[1] unless the line
+# would go over ARGV[3] units, and refreshes the cart's expiry to ARGV[4].
+# Returns {added, quantity of the line}.
+ADD_LINE = """
+local current = tonumber(redis.call("HGET", KEYS[1], ARGV[1])) or 0
+if current + tonumber(ARGV[2]) > tonumber(ARGV[3]) then
+    return {0, current}
+end
+local quantity = redis.call("HINCRBY", KEYS[1], ARGV[1], ARGV[2])
+redis.call("EXPIRE", KEYS[1], ARGV[4])
+return {1, quantity}
+"""
+
+
+def get_stock(product_ids):
+    """
+    Return {product_id: units available} for the given products, served from
+    the cache for `CART_STOCK_TTL` seconds. Unknown products are left out and
+    unavailable products report 0 units.
+    """
+    keys = {f"cart:stock:{pk}": pk for pk in product_ids}
+    stock = {keys[key]: value for key, value in cache.get_many(keys).items()}
+    missing = [pk for pk in product_ids if pk not in stock]
+
+    if missing:
+        fetched = {
+            pk: quantity if is_available else 0
+            for pk, quantity, is_available in Product.objects.filter(
+                pk__in=missing
+            ).values_list("id", "quantity", "is_available")
+        }
+        cache.set_many(
+            {f"cart:stock:{pk}": quantity for pk, quantity in fetched.items()},
+            timeout=settings.CART_STOCK_TTL,
+        )
+        stock.update(fetched)
+    return stock
+
+
+def get_available(product_id):
+    available = get_stock([product_id]).get(product_id, None)
+    if available is None:
+        raise ValidationError(
+            {"product": [f'Invalid pk "{product_id}" - object does not exist.']}
+        )
+    return available
+
+
+def check_stock(product_id, quantity):
+    available = get_available(product_id)
+    if quantity > available:
+        raise ValidationError(
+            {"quantity": [f"Product has only {available} units available."]}
+        )
+
+
+class CartStore:
+    """
+    Keeps each user's cart as {product_id: quantity}. Subclasses implement `lines`, `add`, `set`, `remove` and `clear`.
+    """
+
+    def lines(self, user):
+        raise NotImplementedError
+
+    def add(self, user, product_id, quantity, limit):
+        """
+        Add `quantity` units to the line in one step unless that takes it over
+        `limit` units. Returns the line's new quantity, or None when refused.
+        """
+        raise NotImplementedError
+
+    def set(self, user, product_id, quantity):
+        raise NotImplementedError
+
+    def remove(self, user, product_id):
+        raise NotImplementedError
+
+    def clear(self, user):
+        raise NotImplementedError
+
+    def get(self, user, product_id):
+        return self.lines(user).get(product_id, None)
+
+    def items(self, user):
+        """Unsaved `OrderItem` rows for the user's lines, written at checkout."""
+        return [
+            OrderItem(user=user, product_id=product_id, quantity=quantity)
+            for product_id, quantity in self.lines(user).items()
+        ]
+
+
+class RedisCartStore(CartStore):
+
+    def __init__(self):
+        if not isinstance(caches["default"], RedisCache):
+            raise ImproperlyConfigured(
+                "RedisCartStore requires the default cache to use RedisCache."
+            )
+
+    @cached_property
+    def client(self):
+        return get_redis_client()
+
+    @cached_property
+    def script(self):
+        return self.client.register_script(ADD_LINE)
+
+    def key(self, user):
+        return f"cart:{user.pk}"
+
+    def lines(self, user):
+        return {
+            int(product_id): int(quantity)
+            for product_id, quantity in self.client.hgetall(self.key(user)).items()
+        }
+
+    def get(self, user, product_id):
+        quantity = self.client.hget(self.key(user), product_id)
+        return None if quantity is None else int(quantity)
+
+    def add(self, user, product_id, quantity, limit):
+        added, quantity = self.script(
+            keys=[self.key(user)], args=[product_id, quantity, limit, settings.CART_TTL]
+        )
+        return int(quantity) if added else None
+
+    def set(self, user, product_id, quantity):
+        pipe = self.client.pipeline()
+        pipe.hset(self.key(user), product_id, quantity)
+        pipe.expire(self.key(user), settings.CART_TTL)
+        pipe.execute()
+
+    def remove(self, user, product_id):
+        return bool(self.client.hdel(self.key(user), product_id))
+
+    def clear(self, user):
+        self.client.delete(self.key(user))
+
+
+class LocalCartStore(CartStore):
+    """Per-process in-memory store for a single-process server or tests."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.carts = {}
+
+    def lines(self, user):
+        with self.lock:
+            return dict(self.carts.get(user.pk, {}))
+
+    def add(self, user, product_id, quantity, limit):
+        with self.lock:
+            lines = self.carts.setdefault(user.pk, {})
+            quantity += lines.get(product_id, 0)
+            if quantity > limit:
+                return None
+            lines[product_id] = quantity
+            return quantity
+
+    def set(self, user, product_id, quantity):
+        with self.lock:
+            self.carts.setdefault(user.pk, {})[product_id] = quantity
+
+    def remove(self, user, product_id):
+        with self.lock:
+            return self.carts.get(user.pk, {}).pop(product_id, None) is not None
+
+    def clear(self, user):
+        with self.lock:
+            self.carts.pop(user.pk, None)
+
+
+class DatabaseCartStore(CartStore):
+    """
+    Keeps the lines as the user's open `OrderItem` rows, the ones
+    `/api/order-items/` manages, so both endpoints see the same cart.
+    """
+
+    def rows(self, user, product_id=None):
+        rows = OrderItem.objects.filter(user=user, order=None)
+        return rows if product_id is None else rows.filter(product=product_id)
+
+    def lines(self, user):
+        return dict(
+            self.rows(user).order_by().values("product")
+            .annotate(quantity=Sum("quantity")).values_list("product", "quantity")
+        )
+
+    def get(self, user, product_id):
+        return self.rows(user, product_id).aggregate(quantity=Sum("quantity"))["quantity"]
+
+    @transaction.atomic
+    def add(self, user, product_id, quantity, limit):
+        # Adds for the same user wait on their row, so the limit holds.
+        list(User.objects.select_for_update().filter(pk=user.pk).values_list("pk"))
+        quantity += self.get(user, product_id) or 0
+        if quantity > limit:
+            return None
+        self.set(user, product_id, quantity)
+        return quantity
+
+    @transaction.atomic
+    def set(self, user, product_id, quantity):
+        rows = self.rows(user, product_id)
+        item = rows.order_by("pk").first()
+        if item is None:
+            OrderItem.objects.create(user=user, product_id=product_id, quantity=quantity)
+            return
+        rows.exclude(pk=item.pk).delete()
+        item.quantity = quantity
+        item.save(update_fields=["quantity", "datetime_updated"])
+
+    def remove(self, user, product_id):
+        return self.rows(user, product_id).delete()[0] > 0
+
+    def clear(self, user):
+        self.rows(user).delete()
+
+    def items(self, user):
+        # The open rows are the cart already; checkout takes them as they are.
+        return []
+
+
+_store = (None, None)
+
+
+def get_cart_store():
+    """
+    Return the configured `CART_STORE`, or a `DatabaseCartStore` when none is
+    configured or the configured one cannot run on this cache.
+    """
+    global _store
+    path = getattr(settings, "CART_STORE", None) or "api.carts.DatabaseCartStore"
+    if _store[0] != (path, type(caches["default"])):
+        try:
+            store = import_string(path)()
+        except ImproperlyConfigured as e:
+            logger.warning("Keeping carts in the database: %s", e)
+            store = DatabaseCartStore()
+        _store = ((path, type(caches["default"])), store)
+    return _store[1]
+
+
+def take_stock(items):
+    """
+    Take the units of the unsaved or open `OrderItem` rows out of stock,
+    refusing the lot if any product is gone or short. The product rows stay
+    locked until the transaction ends, so concurrent checkouts of the same
+    products check their stock one after the other.
+    """
+    from .stock import apply_stock
+
+    quantities = {}
+    for item in items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    products = Product.objects.select_for_update().order_by("pk").in_bulk(list(quantities))
+
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id, None)
+        if product is None or not product.is_available:
+            raise ValidationError(
+                {"items": [f"Product {product_id} is no longer available."]}
+            )
+        if quantity > product.quantity:
+            raise ValidationError(
+                {"quantity": [f"Product has only {product.quantity} units available."]}
+            )
+    for item in items:
+        item.product = products[item.product_id]
+
+    apply_stock(
+        {pk: {"delta": -quantity} for pk, quantity in quantities.items()},
+        {pk: product.is_available for pk, product in products.items()},
+    )
+
+
+def checkout(user):
+    """
+    Return the `OrderItem` rows of the user's cart, ready to add to an order:
+    their open rows plus the lines of the cart store written as new rows,
+    with today's prices. Takes the units out of stock and empties the store
+    once the surrounding transaction commits. Must run inside that transaction.
+    """
+    store = get_cart_store()
+    items = list(OrderItem.objects.filter(user=user, order=None))
+    lines = store.items(user)
+    take_stock(items + lines)
+
+    for item in items + lines:
+        item.price = item.product.price
+    if items:
+        OrderItem.objects.bulk_update(items, ["price"])
+    items += OrderItem.objects.bulk_create(lines)
+    if lines:
+        transaction.on_commit(lambda: store.clear(user))
+    return items
+
+
+class CartMixin:
+    """
+    The `/api/cart/` endpoint, served from the cart store. Lines are
+    addressed by product id, so `id` and `product` carry the same value;
+    `/api/order-items/` keeps addressing `OrderItem` rows by their own id.
+    """
+
+    def get_lines(self):
+        user = self.request.user
+        lines = get_cart_store().lines(user)
+        product = self.request.query_params.get("product", None)
+        if product:
+            lines = {pk: quantity for pk, quantity in lines.items() if str(pk) == product}
+        return [
+            {"product": pk, "quantity": quantity, "user": user.pk}
+            for pk, quantity in sorted(lines.items())
+        ]
+
+    def get_line(self, pk):
+        product_id = int(pk) if str(pk).isdigit() else None
+        quantity = None
+        if product_id is not None:
+            quantity = get_cart_store().get(self.request.user, product_id)
+        if quantity is None:
+            raise Http404
+        return {"product": product_id, "quantity": quantity, "user": self.request.user.pk}
+
+    def list(self, request, *args, **kwargs):
+        lines = self.get_lines()
+        page = self.paginate_queryset(lines)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(lines, many=True).data)
+
+    def retrieve(self, request, pk=None, *args, **kwargs):
+        return Response(self.get_serializer(self.get_line(pk)).data)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        product_id = serializer.validated_data["product"]
+        store = get_cart_store()
+
+        available = get_available(product_id)
+        quantity = store.add(
+            request.user, product_id, serializer.validated_data["quantity"], available
+        )
+        if quantity is None:
+            raise ValidationError(
+                {"quantity": [f"Product has only {available} units available."]}
+            )
+        popularity.record(product_id, popularity.CART_ADDS)
+
+        line = {"product": product_id, "quantity": quantity, "user": request.user.pk}
+        return Response(self.get_serializer(line).data, status=status.HTTP_201_CREATED)
+
+    def update(self, request, pk=None, *args, **kwargs):
+        line = self.get_line(pk)
+        serializer = self.get_serializer(line, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+
+        quantity = serializer.validated_data.get("quantity", line["quantity"])
+        check_stock(line["product"], quantity)
+        get_cart_store().set(request.user, line["product"], quantity)
+        line["quantity"] = quantity
+        return Response(self.get_serializer(line).data)
+
+    def partial_update(self, request, *args, **kwargs):
+        return self.update(request, *args, **kwargs)
+
+    def destroy(self, request, pk=None, *args, **kwargs):
+        line = self.get_line(pk)
+        get_cart_store().remove(request.user, line["product"])
+        return Response(status=status.HTTP_204_NO_CONTENT)
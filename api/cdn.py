@@ -0,0 +1,236 @@
+import logging
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils.cache import patch_cache_control
+from django.utils.module_loading import import_string
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+from .cache import bump_list_versions, get_cleared_products
+from .models import Category, Image, Product, Size, Vendor
+from .renderers import RawJSON
+from .serializers import CustomRelatedField
+
+
+logger = logging.getLogger(__name__)
+
+TAGGED_MODELS = (Product, Category, Vendor, Image, Size)
+
+
+def model_key(model):
+    """Tags every list response of `model`, so creates and deletes can purge them."""
+    return model._meta.model_name
+
+
+def instance_key(model, pk):
+    return f"{model._meta.model_name}:{pk}"
+
+
+@lru_cache(maxsize=None)
+def get_plan(serializer_class):
+    """
+    Return the serializer's model and, for each field referring to a tagged
+    model, (name, "nested", serializer class) or (name, "pk", model).
+    """
+    serializer = serializer_class()
+    model = serializer.Meta.model
+    plan = []
+
+    for name, field in serializer.fields.items():
+        source = field.source
+        if isinstance(field, ManyRelatedField):
+            field = field.child_relation
+
+        if isinstance(field, CustomRelatedField):
+            plan.append((name, "nested", field.serializer))
+        elif isinstance(field, ListSerializer):
+            plan.append((name, "nested", type(field.child)))
+        elif isinstance(field, BaseSerializer):
+            plan.append((name, "nested", type(field)))
+        elif isinstance(field, PrimaryKeyRelatedField):
+            related = model._meta.get_field(source).related_model
+            if related in TAGGED_MODELS:
+                plan.append((name, "pk", related))
+    return model, plan
+
+
+@lru_cache(maxsize=None)
+def get_tagged_models(serializer_class):
+    """Names of the tagged models whose rows `serializer_class` output includes."""
+    names, pending, seen = set(), [serializer_class], set()
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        model, plan = get_plan(current)
+        if model in TAGGED_MODELS:
+            names.add(model_key(model))
+        for name, kind, target in plan:
+            if kind == "nested":
+                pending.append(target)
+            else:
+                names.add(model_key(target))
+    return tuple(sorted(names))
+
+
+def _collect(serializer_class, data, keys):
+    if isinstance(data, RawJSON):
+        keys.update(data.surrogate_keys)
+        return
+    if isinstance(data, list):
+        for item in data:
+            _collect(serializer_class, item, keys)
+        return
+    if not isinstance(data, dict):
+        return
+
+    model, plan = get_plan(serializer_class)
+    if model in TAGGED_MODELS and data.get("id", None) is not None:
+        keys.add(instance_key(model, data["id"]))
+
+    for name, kind, target in plan:
+        value = data.get(name, None)
+        if value is None:
+            continue
+        if kind == "nested":
+            _collect(target, value, keys)
+        else:
+            keys.update(instance_key(target, pk) for pk in (value if isinstance(value, list) else [value]))
+
+
+def get_surrogate_keys(serializer_class, data):
+    """
+    Keys for every tagged instance serialized into `data`, found by walking
+    it alongside `serializer_class`, so cached and fast-path output is
+    tagged the same as a ModelSerializer's.
+    """
+    keys = set()
+    if isinstance(data, dict) and isinstance(data.get("results", None), list):
+        data = data["results"]
+    if isinstance(data, list):
+        keys.add(model_key(serializer_class.Meta.model))
+    _collect(serializer_class, data, keys)
+    return sorted(keys)
+
+
+class Purger:
+    """Invalidates CDN objects by surrogate key. Subclasses implement `purge`."""
+
+    def purge(self, keys):
+        raise NotImplementedError
+
+
+class LogPurger(Purger):
+    """Logs purges and keeps the most recent ones in `purged`, for development and tests."""
+
+    def __init__(self):
+        self.purged = deque(maxlen=1000)
+
+    def purge(self, keys):
+        self.purged.append(list(keys))
+        logger.info("Purging surrogate keys: %s", " ".join(keys))
+
+
+_purger = None
+
+
+def get_purger():
+    global _purger
+    path = settings.CDN_PURGER
+    if _purger is None or type(_purger) is not import_string(path):
+        _purger = import_string(path)()
+    return _purger
+
+
+def purge(keys):
+    """
+    Purge `keys` once the current transaction commits, after bumping the
+    list cache versions of their models so the CDN refetches fresh lists.
+    """
+    keys = sorted(set(keys))
+    if keys:
+        transaction.on_commit(lambda: _purge(keys))
+
+
+def _purge(keys):
+    bump_list_versions({key.split(":", 1)[0] for key in keys})
+    get_purger().purge(keys)
+
+
+def purge_instances(model, pks):
+    purge(instance_key(model, pk) for pk in pks)
+
+
+class CdnMiddleware:
+    """
+    Marks successful GET responses of ViewSet actions listed in the view's
+    `cache_max_age` as publicly cacheable, allowing stale copies while the
+    CDN revalidates, and tags them with their surrogate keys.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._cdn_view = (getattr(view_func, "cls", None), getattr(view_func, "actions", None))
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        view, actions = getattr(request, "_cdn_view", (None, None))
+        max_age = getattr(view, "cache_max_age", None)
+
+        if (
+            not max_age
+            or not actions
+            or request.method not in ("GET", "HEAD")
+            or response.status_code != 200
+            or response.has_header("Cache-Control")
+            or actions.get("get", None) not in max_age
+        ):
+            return response
+
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=max_age[actions["get"]],
+            stale_while_revalidate=settings.CDN_STALE_WHILE_REVALIDATE,
+            stale_if_error=settings.CDN_STALE_IF_ERROR,
+        )
+        data = getattr(response, "data", None)
+        if data is not None:
+            keys = get_surrogate_keys(view.serializer_class, data)
+            if keys:
+                response[settings.CDN_SURROGATE_KEY_HEADER] = " ".join(keys)
+        return response
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+@receiver(post_save, sender=Size)
+@receiver(post_delete, sender=Size)
+def purge_instance(sender, instance, **kwargs):
+    purge([instance_key(sender, instance.pk), model_key(sender)])
+
+
+@receiver(m2m_changed, sender=Product.customers.through)
+def purge_product_customers(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        purge_instances(Product, [instance.pk])
+    elif pk_set:
+        purge_instances(Product, pk_set)
+    else:
+        purge_instances(Product, get_cleared_products(instance))
@@ -0,0 +1,211 @@
+from collections import defaultdict
+from types import SimpleNamespace
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+from . import hotcache
+from .serializers import CustomRelatedField
+
+
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.ReadOnlyField,
+)
+
+
+class ValuesSerializer:
+    """
+    Read-only stand-in for `serializer_class(queryset, many=True).data` that
+    builds the same output from `.values()` rows. Nested `CustomRelatedField`
+    and related primary keys are fetched with one query per relation for the
+    whole page instead of once per object, and categories and vendors are
+    read from `api.hotcache`.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._plan = None
+
+    @property
+    def plan(self):
+        if self._plan is None:
+            self._plan = self.compile()
+        return self._plan
+
+    def compile(self):
+        model = self.serializer_class.Meta.model
+        columns = [model._meta.pk.attname]
+        extractors = []
+        relations = []
+
+        for name, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+
+            if isinstance(field, ManyRelatedField):
+                relations.append(self.compile_many(model, name, field))
+                extractors.append((name, "many", columns[0], None))
+                continue
+
+            model_field = self.get_model_field(model, field)
+            if model_field.attname not in columns:
+                columns.append(model_field.attname)
+
+            if isinstance(field, CustomRelatedField):
+                nested = ValuesSerializer(field.serializer)
+                relations.append((name, "nested", model_field.attname, nested))
+                extractors.append((name, "nested", model_field.attname, None))
+            elif model_field.is_relation:
+                extractors.append((name, "value", model_field.attname, None))
+            else:
+                formatter = self.get_formatter(field, model_field)
+                extractors.append((name, "value", model_field.attname, formatter))
+
+        return columns, extractors, relations
+
+    def compile_many(self, model, name, field):
+        child = field.child_relation
+        related = model._meta.get_field(field.source)
+
+        if isinstance(child, CustomRelatedField) and related.one_to_many:
+            return (name, "reverse", related.field.attname, ValuesSerializer(child.serializer))
+
+        if isinstance(child, PrimaryKeyRelatedField) and related.many_to_many:
+            through = related.remote_field.through
+            return (
+                name,
+                "m2m",
+                through,
+                (
+                    through._meta.get_field(related.m2m_field_name()).attname,
+                    through._meta.get_field(related.m2m_reverse_field_name()).attname,
+                ),
+            )
+
+        raise ImproperlyConfigured(
+            f"ValuesSerializer cannot compile field '{name}' of {self.serializer_class.__name__}."
+        )
+
+    def get_model_field(self, model, field):
+        attrs = field.source_attrs
+        model_field = model._meta.get_field(attrs[0])
+
+        if len(attrs) == 1 and (
+            not model_field.is_relation
+            or isinstance(field, (CustomRelatedField, PrimaryKeyRelatedField))
+        ):
+            return model_field
+
+        if (
+            len(attrs) == 2
+            and model_field.many_to_one
+            and attrs[1] in ("pk", model_field.target_field.name)
+            and isinstance(field, serializers.ReadOnlyField)
+        ):
+            return model_field
+
+        raise ImproperlyConfigured(
+            f"ValuesSerializer cannot compile field '{field.field_name}' of {self.serializer_class.__name__}."
+        )
+
+    def get_formatter(self, field, model_field):
+        if type(field) in PASSTHROUGH_FIELDS:
+            return None
+
+        if isinstance(field, serializers.ModelField):
+            attname = model_field.attname
+            return lambda value: field.to_representation(
+                SimpleNamespace(**{attname: value})
+            )
+        return field.to_representation
+
+    def values(self, queryset):
+        return queryset.values(*self.plan[0])
+
+    def serialize(self, queryset):
+        return self.represent(list(self.values(queryset)))
+
+    def represent(self, rows):
+        columns, extractors, relations = self.plan
+        pk = columns[0]
+        related = {}
+
+        for name, kind, source, target in relations:
+            if kind == "nested":
+                ids = {row[source] for row in rows if row[source] is not None}
+                nested_pk = target.plan[0][0]
+                model = target.serializer_class.Meta.model
+                related[name] = hotcache.get_representations(target.serializer_class, ids)
+                missing = ids - related[name].keys()
+                if missing:
+                    related[name].update(
+                        (obj[nested_pk], obj)
+                        for obj in target.serialize(model.objects.filter(pk__in=missing))
+                    )
+
+            elif kind == "reverse":
+                ids = [row[pk] for row in rows]
+                model = target.serializer_class.Meta.model
+                grouped = defaultdict(list)
+                if ids:
+                    nested = list(target.values(
+                        model.objects.filter(**{f"{source}__in": ids}).order_by("pk")
+                    ))
+                    for row, obj in zip(nested, target.represent(nested)):
+                        grouped[row[source]].append(obj)
+                related[name] = grouped
+
+            else:
+                source_column, target_column = target
+                ids = [row[pk] for row in rows]
+                grouped = defaultdict(list)
+                if ids:
+                    # `relationship.all()` has no ORDER BY and is read off the
+                    # (source, target) unique index, i.e. in target order.
+                    links = (
+                        source.objects.filter(**{f"{source_column}__in": ids})
+                        .order_by(source_column, target_column)
+                        .values_list(source_column, target_column)
+                    )
+                    for source_id, target_id in links:
+                        grouped[source_id].append(target_id)
+                related[name] = grouped
+
+        data = []
+        for row in rows:
+            item = {}
+            for name, kind, column, formatter in extractors:
+                value = row[column]
+                if kind == "value":
+                    if formatter is not None and value is not None:
+                        value = formatter(value)
+                    item[name] = value
+                elif kind == "nested":
+                    item[name] = None if value is None else related[name][value]
+                else:
+                    item[name] = list(related[name].get(value, ()))
+            data.append(item)
+        return data
+
+
+class ValuesListMixin:
+    """Serve `list` through `values_serializer` when the view defines one."""
+
+    values_serializer = None
+
+    def list(self, request, *args, **kwargs):
+        if self.values_serializer is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.values_serializer.values(
+            self.filter_queryset(self.get_queryset())
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.values_serializer.represent(page))
+        return Response(self.values_serializer.represent(list(queryset)))
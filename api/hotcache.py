@@ -0,0 +1,131 @@
+import copy
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import Category, Vendor
+
+
+class HotObjects:
+    """
+    Every row of `model` and its `serializer` representation, held by this
+    process. The rows are reloaded when the version stamp in the cache
+    changes, checked at most every HOT_CACHE_CHECK_INTERVAL seconds, and at
+    least every HOT_CACHE_TTL seconds.
+    """
+
+    def __init__(self, model, serializer, select_related=()):
+        self.model = model
+        self.serializer = serializer
+        self.select_related = select_related
+        self.key = f"hot:{model._meta.model_name}:version"
+        self.lock = threading.Lock()
+        self.objects = self.data = self.version = None
+        self.loaded = self.checked = 0.0
+
+    @property
+    def serializer_class(self):
+        return import_string(self.serializer)
+
+    def clear(self):
+        with self.lock:
+            self.objects = self.data = self.version = None
+
+    def load(self, check=False):
+        """
+        Return ({pk: instance}, {pk: representation}), reloading them if stale.
+        With `check`, the version stamp is read even if it was just checked.
+        """
+        now = time.monotonic()
+        with self.lock:
+            if (
+                self.objects is not None
+                and not check
+                and now - self.checked < settings.HOT_CACHE_CHECK_INTERVAL
+            ):
+                return self.objects, self.data
+
+            version = cache.get(self.key)
+            if version is None:
+                cache.add(self.key, uuid.uuid4().hex, timeout=None)
+                version = cache.get(self.key)
+
+            if (
+                self.objects is None
+                or version != self.version
+                or now - self.loaded >= settings.HOT_CACHE_TTL
+            ):
+                serializer_class = self.serializer_class
+                queryset = self.model.objects.select_related(*self.select_related)
+                objects = {obj.pk: obj for obj in queryset}
+                self.data = {pk: dict(serializer_class(obj).data) for pk, obj in objects.items()}
+                self.objects, self.version, self.loaded = objects, version, now
+            self.checked = now
+            return self.objects, self.data
+
+    def invalidate(self):
+        """Drop this process's rows now and every process's once the transaction commits."""
+        self.clear()
+
+        def bump():
+            cache.set(self.key, uuid.uuid4().hex, timeout=None)
+            self.clear()
+
+        transaction.on_commit(bump)
+
+
+HOT_OBJECTS = {
+    Category: HotObjects(Category, "api.serializers.CategorySerializer"),
+    # VendorSerializer reads `user.id`
+    Vendor: HotObjects(Vendor, "api.serializers.VendorSerializer", select_related=("user",)),
+}
+
+
+def get_hot_objects(serializer_class):
+    """The `HotObjects` holding `serializer_class` representations, or None."""
+    hot = HOT_OBJECTS.get(serializer_class.Meta.model, None)
+    if hot is None or hot.serializer_class is not serializer_class:
+        return None
+    return hot
+
+
+def get_instance(queryset, pk, check=False):
+    """
+    A copy of the instance of `queryset` with `pk`, or None when `queryset` is
+    filtered, its model is not held in-process or the row is not loaded yet.
+    Without `check`, the row may have been deleted by another process within
+    the last HOT_CACHE_CHECK_INTERVAL seconds.
+    """
+    hot = HOT_OBJECTS.get(queryset.model, None)
+    if hot is None or queryset.query.where:
+        return None
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    instance = hot.load(check=check)[0].get(pk, None)
+    return None if instance is None else copy.copy(instance)
+
+
+def get_representations(serializer_class, ids):
+    """{pk: representation} of the held `ids` found, or {} when not held in-process."""
+    hot = get_hot_objects(serializer_class)
+    if hot is None:
+        return {}
+    data = hot.load()[1]
+    return {pk: dict(data[pk]) for pk in ids if pk in data}
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+def invalidate_hot_objects(sender, instance, **kwargs):
+    HOT_OBJECTS[sender].invalidate()
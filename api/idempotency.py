@@ -0,0 +1,122 @@
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import get_redis_client
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+# Deletes the lock KEYS[1] only while it still holds the token ARGV[1], so a
+# request that outlived its lock cannot release the next request's.
+RELEASE_LOCK = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+_script = None
+
+
+def acquire_lock(key, timeout):
+    """Take the lock `key` for `timeout` seconds. Returns its token, or None if it is held."""
+    token = uuid.uuid4().hex
+    client = get_redis_client()
+    if client is not None:
+        acquired = client.set(key, token, nx=True, ex=timeout)
+    else:
+        acquired = cache.add(key, token, timeout=timeout)
+    return token if acquired else None
+
+
+def release_lock(key, token):
+    """Release the lock `key` if it is still held with `token`."""
+    global _script
+    client = get_redis_client()
+    if client is not None:
+        if _script is None:
+            _script = client.register_script(RELEASE_LOCK)
+        _script(keys=[key], args=[token], client=client)
+    elif cache.get(key) == token:
+        cache.delete(key)
+
+
+def get_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    payload = "\n".join((request.method, request.path, body))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class IdempotentCreateMixin:
+    """
+    Answer retried `create` calls carrying the same `Idempotency-Key` header
+    from the cache. The first successful response is stored with a
+    fingerprint of the request, and a cache lock turns concurrent duplicates
+    into a 409 instead of a second write.
+    """
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER, None)
+        if not key:
+            return super().create(request, *args, **kwargs)
+
+        if len(key) > 255:
+            return Response(
+                {"detail": f"{IDEMPOTENCY_HEADER} may not be longer than 255 characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        cache_key = f"idempotency:{self.basename}:{request.user.pk}:{digest}"
+        lock_key = f"{cache_key}:lock"
+        fingerprint = get_fingerprint(request)
+
+        stored = cache.get(cache_key)
+        if stored is not None:
+            return self.replay(stored, fingerprint)
+
+        token = acquire_lock(lock_key, getattr(settings, "IDEMPOTENCY_LOCK_TIMEOUT", 30))
+        if token is None:
+            return Response(
+                {"detail": f"A request with this {IDEMPOTENCY_HEADER} is already in progress."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        try:
+            stored = cache.get(cache_key)
+            if stored is not None:
+                return self.replay(stored, fingerprint)
+
+            response = super().create(request, *args, **kwargs)
+            if status.is_success(response.status_code):
+                cache.set(
+                    cache_key,
+                    {
+                        "fingerprint": fingerprint,
+                        "status": response.status_code,
+                        "data": response.data,
+                    },
+                    timeout=getattr(settings, "IDEMPOTENCY_KEY_TTL", 60 * 60 * 24),
+                )
+            return response
+        finally:
+            release_lock(lock_key, token)
+
+    def replay(self, stored, fingerprint):
+        if stored["fingerprint"] != fingerprint:
+            return Response(
+                {"detail": f"{IDEMPOTENCY_HEADER} was already used for a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+
+        return Response(
+            stored["data"],
+            status=stored["status"],
+            headers={"Idempotent-Replayed": "true"},
+        )
@@ -0,0 +1,188 @@
+import logging
+from pathlib import Path
+
+from cloudinary import CloudinaryResource
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import UploadedFile
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from . import cdn
+from .cache import invalidate_products
+from .listing import refresh_listings
+from .models import Image, Product
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FIELDS = {Product: "display_image", Image: "url"}
+
+
+class VariantBackend:
+    """Builds the delivery URL of every IMAGE_VARIANTS size of a stored image."""
+
+    def build(self, resource):
+        raise NotImplementedError
+
+
+class CloudinaryBackend(VariantBackend):
+    """Cloudinary transformation URLs, resized and re-encoded on the CDN."""
+
+    def build(self, resource):
+        try:
+            return {
+                name: resource.build_url(
+                    secure=True, fetch_format="auto", quality="auto", **options
+                )
+                for name, options in settings.IMAGE_VARIANTS.items()
+            }
+        except ValueError as e:
+            # Raised for a missing cloud_name, e.g. CLOUD_NAME unset in development.
+            logger.warning("Cannot build variants of %s: %s", resource.public_id, e)
+            return {}
+
+
+class PillowBackend(VariantBackend):
+    """
+    Local stand-in for tests and development. Resizes the original at
+    MEDIA_ROOT/<public_id>.<format> with Pillow into MEDIA_ROOT/variants/ and
+    returns MEDIA_URL paths. Originals that are missing get no variants.
+    """
+
+    def __init__(self):
+        try:
+            from PIL import Image as PILImage, ImageOps
+        except ImportError:
+            raise ImproperlyConfigured("PillowBackend requires Pillow to be installed.")
+        self.pil_image, self.image_ops = PILImage, ImageOps
+
+    def build(self, resource):
+        root = Path(settings.MEDIA_ROOT)
+        filename = f"{resource.public_id}.{resource.format or 'jpg'}"
+        source = root / filename
+        if not source.exists():
+            logger.warning("No original at %s, skipping variants", source)
+            return {}
+
+        srcset = {}
+        with self.pil_image.open(source) as original:
+            for name, options in settings.IMAGE_VARIANTS.items():
+                target = root / "variants" / name / filename
+                if not target.exists():
+                    size = (options["width"], options.get("height", options["width"]))
+                    if options.get("crop", None) == "fill":
+                        image = self.image_ops.fit(original, size)
+                    else:
+                        image = original.copy()
+                        image.thumbnail(size)
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    image.save(target)
+                srcset[name] = f"{settings.MEDIA_URL}variants/{name}/{filename}"
+        return srcset
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    path = settings.IMAGE_VARIANT_BACKEND
+    if _backend is None or type(_backend) is not import_string(path):
+        _backend = import_string(path)()
+    return _backend
+
+
+def get_resource(model, value):
+    """The stored image `value` of `model` as a CloudinaryResource, or None if there is none."""
+    if isinstance(value, str) and value:
+        value = model._meta.get_field(IMAGE_FIELDS[model]).parse_cloudinary_resource(value)
+    if not isinstance(value, CloudinaryResource) or not value.public_id:
+        return None
+    return value
+
+
+def build_srcset(model, value):
+    """Variant URLs for the stored image `value` of `model`, or {} if there is none."""
+    resource = get_resource(model, value)
+    return {} if resource is None else get_backend().build(resource)
+
+
+def _image_key(model, value):
+    resource = get_resource(model, value)
+    return None if resource is None else (resource.public_id, resource.format)
+
+
+def _product_id(instance):
+    return instance.pk if isinstance(instance, Product) else instance.product_id
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=Image)
+def set_srcset(sender, instance, raw, update_fields, **kwargs):
+    field = IMAGE_FIELDS[sender]
+    if raw or (update_fields is not None and field not in update_fields):
+        return
+    value = getattr(instance, field)
+    # Uploads only get their public id when the field stores them during the
+    # save, so their variants are filled in once the row is written.
+    if isinstance(value, UploadedFile) or (
+        update_fields is not None and "srcset" not in update_fields
+    ):
+        instance._srcset_pending = True
+        return
+
+    # Saves that keep the image keep its variants, unless it has none yet.
+    if not instance._state.adding:
+        stored = sender.objects.filter(pk=instance.pk).values_list(field, "srcset").first()
+        if stored is not None:
+            image, srcset = stored
+            if srcset and _image_key(sender, image) == _image_key(sender, value):
+                instance.srcset = srcset
+                return
+    instance.srcset = build_srcset(sender, value)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Image)
+def set_uploaded_srcset(sender, instance, raw, **kwargs):
+    if not getattr(instance, "_srcset_pending", False):
+        return
+    del instance._srcset_pending
+
+    instance.srcset = build_srcset(sender, getattr(instance, IMAGE_FIELDS[sender]))
+    sender.objects.filter(pk=instance.pk).update(srcset=instance.srcset)
+    refresh_listings([_product_id(instance)])
+    invalidate_products([_product_id(instance)])
+    cdn.purge_instances(sender, [instance.pk])
+
+
+def build_variants(model, batch_size=500):
+    """Store the variants of every `model` row whose srcset is out of date. Returns the rows updated."""
+    fields = ["pk", IMAGE_FIELDS[model], "srcset"]
+    if model is Image:
+        fields.append("product")
+    last_pk, updated = 0, 0
+
+    while True:
+        batch = list(
+            model.objects.filter(pk__gt=last_pk).order_by("pk").only(*fields)[:batch_size]
+        )
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+
+        changed = []
+        for instance in batch:
+            srcset = build_srcset(model, getattr(instance, IMAGE_FIELDS[model]))
+            if srcset != instance.srcset:
+                instance.srcset = srcset
+                changed.append(instance)
+        if changed:
+            model.objects.bulk_update(changed, ["srcset"])
+            refresh_listings({_product_id(instance) for instance in changed})
+            invalidate_products({_product_id(instance) for instance in changed})
+            cdn.purge_instances(model, [instance.pk for instance in changed])
+            updated += len(changed)
+    return updated
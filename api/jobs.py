@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from . import archive, cdn, outbox, popularity, recommendations, typeahead, warming
+from .cache import invalidate_products
+from .listing import refresh_listings
+from .models import JobCursor, OrderItem, Product, Review
+from .scheduler import job
+
+
+@job(interval=60 * 60, batch_size=500, time_budget=60)
+def review_aggregates(run):
+    """
+    Recompute `Product.stars` and `Product.reviews` from the reviews, walking
+    products by id and resuming where the last run ran out of budget.
+    """
+    cursor, _ = JobCursor.objects.get_or_create(name="review_aggregates")
+    last = int(cursor.value or 0)
+    updated = 0
+
+    while True:
+        products = list(
+            Product.objects.filter(pk__gt=last)
+            .order_by("pk")
+            .only("id", "stars", "reviews")[: run.batch_size]
+        )
+        if not products:
+            last = 0
+            break
+
+        totals = {
+            row["product"]: row
+            for row in Review.objects.filter(product__in=products)
+            .values("product")
+            .annotate(count=Count("id"), total=Sum("stars"))
+        }
+        changed = []
+        for product in products:
+            row = totals.get(product.pk, {"count": 0, "total": 0})
+            stars = row["total"] // row["count"] if row["count"] else 0
+            if (product.stars, product.reviews) != (stars, row["count"]):
+                product.stars, product.reviews = stars, row["count"]
+                changed.append(product)
+
+        Product.objects.bulk_update(changed, ["stars", "reviews"])
+        refresh_listings([product.pk for product in changed])
+        invalidate_products([product.pk for product in changed])
+        cdn.purge_instances(Product, [product.pk for product in changed])
+        updated += len(changed)
+        last = products[-1].pk
+        if run.expired():
+            break
+
+    cursor.value = str(last or "")
+    cursor.save()
+    return updated
+
+
+@job(interval=settings.POPULARITY_FLUSH_INTERVAL, batch_size=settings.POPULARITY_BATCH_SIZE)
+def trending(run):
+    now = timezone.now()
+    elapsed = settings.POPULARITY_FLUSH_INTERVAL
+    if run.last_started is not None:
+        elapsed = (now - run.last_started).total_seconds()
+
+    updated = popularity.flush(batch_size=run.batch_size)
+    popularity.decay(elapsed)
+    return updated
+
+
+@job(interval=60 * 60, batch_size=settings.RECOMMENDATIONS_BATCH_SIZE)
+def related_products(run):
+    return recommendations.build(batch_size=run.batch_size)
+
+
+@job(interval=60 * 60 * 6)
+def suggestion_index(run):
+    typeahead.rebuild()
+
+
+@job(interval=10, batch_size=settings.OUTBOX_BATCH_SIZE, time_budget=30)
+def outbox_events(run):
+    dispatched = 0
+    while True:
+        count = outbox.dispatch(batch_size=run.batch_size)
+        dispatched += count
+        if count < run.batch_size or run.expired():
+            break
+    return dispatched
+
+
+@job(interval=60 * 60, batch_size=1000, time_budget=60)
+def abandoned_carts(run):
+    """Delete `OrderItem` cart lines untouched for `CART_ABANDON_AFTER` seconds."""
+    cutoff = timezone.now() - timedelta(seconds=settings.CART_ABANDON_AFTER)
+    abandoned = OrderItem.objects.filter(order=None, datetime_updated__lt=cutoff)
+    deleted = 0
+
+    while True:
+        ids = list(abandoned.values_list("pk", flat=True)[: run.batch_size])
+        if not ids:
+            break
+        deleted += OrderItem.objects.filter(pk__in=ids, order=None).delete()[0]
+        if run.expired():
+            break
+    return deleted
+
+
+@job(interval=60 * 60 * 24, batch_size=settings.ORDER_ARCHIVE_BATCH_SIZE, time_budget=60 * 5)
+def order_archive(run):
+    return archive.archive_orders(batch_size=run.batch_size, run=run)
+
+
+@job(interval=60)
+def cache_warming(run):
+    """Warm the cache when it comes up empty, i.e. after a deploy or a flush."""
+    if not cache.add("cache:warmed", 1, timeout=None):
+        return 0
+    warming.warm_urls(settings.CACHE_WARM_URLS)
+    return warming.warm_products()
@@ -0,0 +1,161 @@
+import json
+
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from rest_framework.utils.encoders import JSONEncoder
+
+from .cache import get_cleared_products
+from .cdn import get_surrogate_keys
+from .fastpath import ValuesSerializer
+from .models import Category, Image, Product, ProductListing, Size, Vendor
+from .renderers import RawJSON
+from .serializers import ProductSerializer
+
+
+# Columns copied from `Product`. The counters are updated in place by
+# `api.popularity` far more often than the rest of the product changes,
+# so they are left out of `data` and appended from the columns; they are
+# the last fields of `ProductSerializer`, so the key order is unchanged.
+COLUMNS = (
+    "parent_id",
+    "name",
+    "datetime_created",
+    "category_id",
+    "vendor_id",
+    "is_available",
+    "price",
+    "featured",
+    "stars",
+    "reviews",
+    "views",
+    "cart_adds",
+    "trending",
+)
+COUNTERS = ("views", "cart_adds", "trending")
+
+values_serializer = ValuesSerializer(ProductSerializer)
+
+
+def refresh_listings(product_ids, batch_size=500):
+    """
+    Re-render the listing rows of `product_ids` from the source tables, in
+    batches of `batch_size`. Rows of products that no longer exist are deleted.
+    """
+    product_ids = sorted(set(product_ids))
+
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start : start + batch_size]
+        rows = list(values_serializer.values(Product.objects.filter(pk__in=batch)))
+        listings = [
+            ProductListing(
+                id=row["id"],
+                data=render(item),
+                surrogate_keys=" ".join(get_surrogate_keys(ProductSerializer, item)),
+                **{column: row[column] for column in COLUMNS},
+            )
+            for row, item in zip(rows, values_serializer.represent(rows))
+        ]
+        ProductListing.objects.bulk_create(
+            listings,
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=[
+                "data",
+                "surrogate_keys",
+                *(column.removesuffix("_id") for column in COLUMNS),
+            ],
+        )
+        ProductListing.objects.filter(id__in=batch).exclude(
+            id__in=[listing.id for listing in listings]
+        ).delete()
+
+
+def rebuild_listings(batch_size=500):
+    """Render every product and drop listing rows without one. Returns the rows written."""
+    product_ids = list(Product.objects.values_list("id", flat=True))
+    ProductListing.objects.exclude(id__in=Product.objects.values("id")).delete()
+    refresh_listings(product_ids, batch_size=batch_size)
+    return len(product_ids)
+
+
+def render(item):
+    """`item` without its counters, as compact JSON like `FastJSONRenderer` writes it."""
+    data = json.dumps(
+        {key: value for key, value in item.items() if key not in COUNTERS},
+        cls=JSONEncoder,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return data.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+
+
+def values(queryset):
+    """The rows of `queryset` read by `represent`."""
+    return queryset.values_list("data", "surrogate_keys", *COUNTERS)
+
+
+def represent(rows):
+    """List items as `RawJSON`, from (data, surrogate_keys, *COUNTERS) rows."""
+    return [
+        RawJSON(
+            f'{data[:-1]},"views":{views},"cart_adds":{cart_adds},"trending":{json.dumps(trending)}}}',
+            surrogate_keys.split(),
+        )
+        for data, surrogate_keys, views, cart_adds, trending in rows
+    ]
+
+
+@receiver(post_migrate)
+def backfill_listings(sender, plan=None, **kwargs):
+    # The rows hold live `ProductSerializer` output, which the historical
+    # models of a migration cannot render, so the table is filled in once
+    # `migrate` has brought every model up to date.
+    if sender.name != "api" or not plan:
+        return
+    if any(
+        migration.app_label == "api" and migration.name == "0015_product_listing" and not backwards
+        for migration, backwards in plan
+    ):
+        rebuild_listings()
+
+
+@receiver(post_save, sender=Product)
+def refresh_product(sender, instance, raw, **kwargs):
+    if not raw:
+        refresh_listings([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def delete_product(sender, instance, **kwargs):
+    ProductListing.objects.filter(id=instance.pk).delete()
+
+
+@receiver(m2m_changed, sender=Product.customers.through)
+def refresh_product_customers(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        refresh_listings([instance.pk])
+    elif pk_set:
+        refresh_listings(pk_set)
+    else:
+        refresh_listings(get_cleared_products(instance))
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+@receiver(post_save, sender=Size)
+@receiver(post_delete, sender=Size)
+def refresh_product_children(sender, instance, **kwargs):
+    refresh_listings([instance.product_id])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Vendor)
+def refresh_related_products(sender, instance, created, **kwargs):
+    if created:
+        return
+    field = "category" if sender is Category else "vendor"
+    refresh_listings(
+        ProductListing.objects.filter(**{field: instance}).values_list("id", flat=True)
+    )
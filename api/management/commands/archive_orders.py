@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import archive
+
+
+class Command(BaseCommand):
+    help = "Move completed orders older than ORDER_ARCHIVE_AFTER into the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=int, default=None, help="Age in days.")
+        parser.add_argument("--batch-size", type=int, default=settings.ORDER_ARCHIVE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        cutoff = None
+        if options["older_than"] is not None:
+            cutoff = timezone.now() - timedelta(days=options["older_than"])
+
+        archived = archive.archive_orders(cutoff, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} orders."))
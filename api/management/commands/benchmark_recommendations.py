@@ -0,0 +1,84 @@
+import random
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.recommendations import count_pairs
+
+
+def sparse_count_pairs(rows):
+    """The former SciPy path: B.T @ B over a sparse order x product basket matrix."""
+    import numpy as np
+    from scipy import sparse
+
+    order_index = {}
+    order_idx = np.fromiter(
+        (order_index.setdefault(order_id, len(order_index)) for order_id, _ in rows),
+        dtype=np.int64,
+        count=len(rows),
+    )
+    product_ids, product_idx = np.unique(
+        np.fromiter((product_id for _, product_id in rows), dtype=np.int64, count=len(rows)),
+        return_inverse=True,
+    )
+    baskets = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (order_idx, product_idx)),
+        shape=(len(order_index), len(product_ids)),
+    )
+    baskets.data[:] = 1
+    pairs = (baskets.T @ baskets).tocoo()
+    return Counter(
+        dict(
+            zip(
+                zip(product_ids[pairs.row].tolist(), product_ids[pairs.col].tolist()),
+                pairs.data.tolist(),
+            )
+        )
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare count_pairs with the former SciPy sparse-matrix path on one "
+        "batch of synthetic baskets per mean basket size."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=settings.RECOMMENDATIONS_BATCH_SIZE)
+        parser.add_argument("--products", type=int, default=5000)
+        parser.add_argument("--basket-sizes", default="3,8,20", help="Mean products per order.")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            import scipy  # noqa: F401
+        except ImportError:
+            raise CommandError("The comparison needs NumPy and SciPy installed.")
+
+        rng = random.Random(options["seed"])
+        for mean in (int(size) for size in options["basket_sizes"].split(",")):
+            rows = [
+                (order_id, rng.randint(1, options["products"]))
+                for order_id in range(options["orders"])
+                for _ in range(max(1, int(rng.expovariate(1 / mean))))
+            ]
+            counts = count_pairs(rows)
+            if sparse_count_pairs(rows) != counts:
+                raise CommandError("The SciPy path counts differently.")
+
+            python_time = self.measure(lambda: count_pairs(rows), options["repeat"])
+            sparse_time = self.measure(lambda: sparse_count_pairs(rows), options["repeat"])
+            self.stdout.write(
+                f"  mean basket {mean:3}  {len(rows):7} lines  {len(counts):8} pairs  "
+                f"python {python_time * 1e3:8.1f} ms/batch  "
+                f"scipy {sparse_time * 1e3:8.1f} ms/batch"
+            )
+
+    def measure(self, func, repeat):
+        start = time.process_time()
+        for _ in range(repeat):
+            func()
+        return (time.process_time() - start) / repeat
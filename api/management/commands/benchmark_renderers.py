@@ -0,0 +1,68 @@
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer, orjson
+from api.views import ProductViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare JSONRenderer/JSONParser with FastJSONRenderer/FastJSONParser "
+        "on a page of ProductSerializer output."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        products = list(ProductViewSet.queryset.order_by("pk")[: options["limit"]])
+        if not products:
+            self.stdout.write("No products, skipped.")
+            return
+
+        page = {
+            "count": len(products),
+            "next": None,
+            "previous": None,
+            "results": ProductViewSet.serializer_class(products, many=True).data,
+        }
+        expected = JSONRenderer().render(page)
+        rendered = FastJSONRenderer().render(page)
+        if json.loads(rendered) != json.loads(expected):
+            raise CommandError("FastJSONRenderer output differs.")
+
+        pairs = (
+            ("render", lambda: JSONRenderer().render(page), lambda: FastJSONRenderer().render(page)),
+            (
+                "parse",
+                lambda: JSONParser().parse(io.BytesIO(expected)),
+                lambda: FastJSONParser().parse(io.BytesIO(expected)),
+            ),
+        )
+
+        self.stdout.write(
+            f"{len(products)} products, {len(expected)} bytes, "
+            f"{'identical' if rendered == expected else 'equivalent'} output, "
+            f"orjson {'installed' if orjson is not None else 'not installed'}"
+        )
+        for name, slow, fast in pairs:
+            slow_time = self.measure(slow, options["repeat"])
+            fast_time = self.measure(fast, options["repeat"])
+            self.stdout.write(
+                f"  {name:6}  stdlib {slow_time * 1e3:7.2f} ms/page  "
+                f"fast {fast_time * 1e3:7.2f} ms/page  "
+                f"speedup {slow_time / fast_time if fast_time else float('inf'):.1f}x"
+            )
+
+    def measure(self, func, repeat):
+        start = time.process_time()
+        for _ in range(repeat):
+            func()
+        return (time.process_time() - start) / repeat
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from api.views import ProductViewSet, ReviewViewSet, SizeViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ModelSerializer and ValuesSerializer output and per-row CPU "
+        "time for the product, review and size list endpoints."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+
+        for viewset in (ProductViewSet, ReviewViewSet, SizeViewSet):
+            queryset = viewset.queryset.order_by("pk")[: options["limit"]]
+            serializer_class = viewset.serializer_class
+            values_serializer = viewset.values_serializer
+
+            def serialize():
+                return serializer_class(list(queryset.all()), many=True).data
+
+            def fast_serialize():
+                return values_serializer.serialize(queryset)
+
+            if not queryset.exists():
+                self.stdout.write(f"{serializer_class.__name__}: no rows, skipped")
+                continue
+
+            expected = renderer.render(serialize())
+            if renderer.render(fast_serialize()) != expected:
+                raise CommandError(
+                    f"{serializer_class.__name__}: fast path output differs."
+                )
+
+            rows = queryset.count()
+            slow, slow_queries = self.measure(serialize, options["repeat"])
+            fast, fast_queries = self.measure(fast_serialize, options["repeat"])
+
+            self.stdout.write(
+                f"{serializer_class.__name__}: {rows} rows, "
+                f"{len(expected)} bytes identical\n"
+                f"  ModelSerializer  {slow / rows * 1e6:9.1f} us/row  {slow_queries} queries\n"
+                f"  ValuesSerializer {fast / rows * 1e6:9.1f} us/row  {fast_queries} queries\n"
+                f"  speedup {slow / fast if fast else float('inf'):.1f}x"
+            )
+
+    def measure(self, func, repeat):
+        with CaptureQueriesContext(connection) as queries:
+            func()
+
+        start = time.process_time()
+        for _ in range(repeat):
+            func()
+        return (time.process_time() - start) / repeat, len(queries)
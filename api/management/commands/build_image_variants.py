@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api import images
+from api.models import Image, Product
+
+
+class Command(BaseCommand):
+    help = "Store the IMAGE_VARIANTS delivery URLs of existing product images."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        products = images.build_variants(Product, batch_size=options["batch_size"])
+        rows = images.build_variants(Image, batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Updated the variants of {products} products and {rows} images.")
+        )
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Update the "customers also bought" neighbours from completed orders.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Recount every completed order instead of those since the last run.",
+        )
+        parser.add_argument("--top-k", type=int, default=None)
+        parser.add_argument("--batch-size", type=int, default=settings.RECOMMENDATIONS_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        count = recommendations.build(
+            full=options["full"], top_k=options["top_k"], batch_size=options["batch_size"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Refreshed neighbours of {count} products."))
@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import outbox
+
+
+class Command(BaseCommand):
+    help = "Dispatch pending outbox events to their registered handlers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new events.")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to sleep when idle.")
+        parser.add_argument("--batch-size", type=int, default=settings.OUTBOX_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        while True:
+            claimed = outbox.dispatch(batch_size=options["batch_size"])
+            if claimed:
+                self.stdout.write(f"Dispatched {claimed} outbox events.")
+
+            if not options["loop"]:
+                break
+            if claimed < options["batch_size"]:
+                time.sleep(options["interval"])
@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import popularity
+
+
+class Command(BaseCommand):
+    help = (
+        "Write buffered product popularity counters to the database. Trending "
+        "scores are decayed by the scheduler's trending job."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep flushing every --interval seconds.")
+        parser.add_argument("--interval", type=int, default=settings.POPULARITY_FLUSH_INTERVAL)
+        parser.add_argument("--batch-size", type=int, default=settings.POPULARITY_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            updated = popularity.flush(batch_size=options["batch_size"])
+            self.stdout.write(f"Flushed popularity counters for {updated} products.")
+
+            if not options["loop"]:
+                break
+            time.sleep(max(options["interval"] - (time.monotonic() - started), 0))
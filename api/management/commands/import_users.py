@@ -0,0 +1,45 @@
+import csv
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.provisioning import provision_users
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield {key: value for key, value in row.items() if value not in ("", None)}
+
+
+def read_json_lines(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users and auth tokens in bulk from a CSV (with a header row) or "
+        "JSON lines file with email, password or password_hash, first_name, "
+        "last_name, phone_number and is_vendor."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=settings.USER_IMPORT_BATCH_SIZE)
+        parser.add_argument("--workers", type=int, default=None, help="Password hashing processes.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        rows = read_csv(path) if path.endswith(".csv") else read_json_lines(path)
+        report = provision_users(rows, options["batch_size"], options["workers"])
+
+        for error in report["errors"]:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']} users, skipped {len(report['skipped'])} "
+            f"existing emails, {len(report['errors'])} invalid rows."
+        ))
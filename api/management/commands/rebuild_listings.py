@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api import listing
+
+
+class Command(BaseCommand):
+    help = "Render every product into the product list read model."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = listing.rebuild_listings(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rendered {count} products."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.analytics import rebuild_sales
+
+
+class Command(BaseCommand):
+    help = "Regenerate the vendor and product daily sales rollups from completed orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rebuild_sales(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS("Sales rollups rebuilt."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api import typeahead
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product and category name suggestion index."
+
+    def handle(self, *args, **options):
+        typeahead.rebuild()
+        self.stdout.write(self.style.SUCCESS("Suggestion index rebuilt."))
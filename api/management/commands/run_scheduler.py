@@ -0,0 +1,54 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import scheduler
+from api.models import ScheduledJob
+
+
+class Command(BaseCommand):
+    help = "Run periodic maintenance jobs, one node per job at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument("jobs", nargs="*", help="Run these jobs now instead of on schedule.")
+        parser.add_argument("--once", action="store_true", help="Run due jobs once and exit.")
+        parser.add_argument("--list", action="store_true", help="Show each job's schedule and stats.")
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--time-budget", type=int, default=None, help="Seconds each job may run.")
+
+    def handle(self, *args, **options):
+        jobs = scheduler.get_jobs()
+        unknown = set(options["jobs"]) - set(jobs)
+        if unknown:
+            raise CommandError(f"Unknown jobs: {', '.join(sorted(unknown))}")
+
+        if options["list"]:
+            return self.list(jobs)
+
+        owner = scheduler.get_owner()
+        limits = {"batch_size": options["batch_size"], "time_budget": options["time_budget"]}
+        while True:
+            for name in scheduler.run_pending(owner, options["jobs"], **limits):
+                self.stdout.write(f"Ran {name}.")
+
+            if options["once"] or options["jobs"]:
+                break
+            time.sleep(settings.SCHEDULER_TICK)
+
+    def list(self, jobs):
+        states = ScheduledJob.objects.in_bulk(list(jobs), field_name="name")
+        for name, job in jobs.items():
+            state = states.get(name, None)
+            if state is None:
+                self.stdout.write(f"{name}: every {job.get_option('interval')}s, never run")
+                continue
+
+            average = state.total_duration / state.runs if state.runs else 0
+            self.stdout.write(
+                f"{name}: every {job.get_option('interval')}s, next {state.next_run_at:%Y-%m-%d %H:%M:%S}, "
+                f"{state.runs} runs, {state.failures} failures, "
+                f"last {state.last_duration or 0:.2f}s (avg {average:.2f}s)"
+                + (f", held by {state.lease_owner}" if state.lease_owner else "")
+                + (f"\n  last error: {state.last_error}" if state.last_error else "")
+            )
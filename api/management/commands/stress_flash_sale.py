@@ -0,0 +1,272 @@
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.db.models import Count, Sum
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.carts import get_cart_store
+from api.models import Category, Order, OrderItem, OutboxEvent, Product, User, Vendor
+
+
+def percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+
+def classify(error):
+    """Name a database error raised by a view: deadlock, lock timeout or other."""
+    code = getattr(error.__cause__, "pgcode", None)
+    message = str(error).lower()
+    if code == "40P01" or "deadlock" in message:
+        return "deadlock"
+    if code in ("55P03", "40001") or "database is locked" in message:
+        return "lock timeout"
+    return type(error).__name__
+
+
+class LockMonitor:
+    """Samples ungranted Postgres locks on this database while a phase runs."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if connection.vendor == "postgresql":
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def run(self):
+        # `connection` is per thread, so this opens and closes its own.
+        try:
+            with connection.cursor() as cursor:
+                while not self.stopped.wait(self.interval):
+                    cursor.execute(
+                        "SELECT count(*) FROM pg_locks l JOIN pg_database d ON d.oid = l.database "
+                        "WHERE NOT l.granted AND d.datname = current_database()"
+                    )
+                    self.samples.append(cursor.fetchone()[0])
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the cart and checkout views with many buyers racing for one "
+        "low-stock product and check the stock and order invariants. Creates "
+        "its own users, vendor, category and product in the configured database, "
+        "so it refuses to run with DEBUG off unless given --i-know. Throttles "
+        "are off for the run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--buyers", type=int, default=200)
+        parser.add_argument("--stock", type=int, default=20)
+        parser.add_argument("--quantity", type=int, default=1, help="Units per add to cart.")
+        parser.add_argument("--adds", type=int, default=2, help="Concurrent adds per buyer.")
+        parser.add_argument("--workers", type=int, default=32)
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--keep", action="store_true", help="Keep the generated rows.")
+        parser.add_argument(
+            "--i-know",
+            action="store_true",
+            help="Run with DEBUG off, writing test rows to what may be a production database.",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["i_know"]:
+            raise CommandError(
+                f"DEBUG is off, so {connection.settings_dict['NAME']} may be a production "
+                "database. Pass --i-know to create and delete the test rows there anyway."
+            )
+
+        # Scopes without a rate are not throttled, and checkout_ip would
+        # otherwise cap every run at 200 checkouts a minute from this host.
+        rates = {**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}}
+        with override_settings(REST_FRAMEWORK=rates):
+            self.run(options)
+
+    def run(self, options):
+        random.seed(options["seed"])
+        tag = uuid.uuid4().hex[:8]
+        product, buyers = self.setup(tag, options["buyers"], options["stock"])
+        self.stdout.write(
+            f"{len(buyers)} buyers, {options['workers']} workers, {options['stock']} units "
+            f"of product {product.pk} on {connection.vendor}"
+        )
+
+        try:
+            deadlocks = self.get_deadlocks()
+            cart = [
+                (token, "/api/cart/", {"product": product.pk, "quantity": options["quantity"]})
+                for token in buyers
+                for _ in range(options["adds"])
+            ]
+            random.shuffle(cart)
+            self.run_phase("cart", cart, options["workers"])
+
+            checkout = [(token, "/api/orders/", {}) for token in buyers]
+            random.shuffle(checkout)
+            self.run_phase("checkout", checkout, options["workers"])
+
+            if deadlocks is not None:
+                self.stdout.write(f"deadlocks (pg_stat_database): {self.get_deadlocks() - deadlocks}")
+
+            violations = self.check_invariants(product, options["stock"], [token.user_id for token in buyers])
+        finally:
+            if not options["keep"]:
+                self.teardown(tag, product)
+
+        if violations:
+            raise CommandError("Invariants violated:\n  " + "\n  ".join(violations))
+        self.stdout.write(self.style.SUCCESS("All invariants held."))
+
+    def setup(self, tag, buyers, stock):
+        password = make_password(None)
+        vendor_user = User.objects.create(
+            email=f"flash-{tag}-vendor@example.com", password=password, is_vendor=True
+        )
+        product = Product.objects.create(
+            name=f"Flash sale {tag}",
+            category=Category.objects.create(name=f"Flash sale {tag}"),
+            vendor=Vendor.objects.create(user=vendor_user, name=f"Flash sale {tag}"),
+            description="Stress test product.",
+            price=100,
+            quantity=stock,
+            display_image=f"flash-sale-{tag}",
+        )
+        users = User.objects.bulk_create(
+            [User(email=f"flash-{tag}-{i}@example.com", password=password) for i in range(buyers)]
+        )
+        tokens = Token.objects.bulk_create(
+            [Token(key=Token.generate_key(), user=user) for user in users]
+        )
+        return product, tokens
+
+    def teardown(self, tag, product):
+        users = User.objects.filter(email__startswith=f"flash-{tag}-")
+        orders = Order.objects.filter(user__in=users)
+        OutboxEvent.objects.filter(
+            payload__order__in=[str(pk) for pk in orders.values_list("pk", flat=True)]
+        ).delete()
+        orders.delete()
+        store = get_cart_store()
+        for user in users:
+            store.clear(user)
+        category = product.category
+        product.delete()
+        category.delete()
+        users.delete()
+
+    def request(self, token, path, data):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        start = time.perf_counter()
+        try:
+            outcome = client.post(path, data, format="json").status_code
+        except DatabaseError as e:
+            outcome = classify(e)
+        except Exception as e:
+            outcome = type(e).__name__
+        return outcome, time.perf_counter() - start
+
+    def run_phase(self, name, calls, workers):
+        ready = threading.Event()
+
+        def call(args):
+            ready.wait()
+            return self.request(*args)
+
+        monitor = LockMonitor()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(call, args) for args in calls]
+            monitor.start()
+            start = time.perf_counter()
+            ready.set()
+            results = [future.result() for future in futures]
+            elapsed = time.perf_counter() - start
+        monitor.stop()
+
+        outcomes = Counter(outcome for outcome, _ in results)
+        latencies = sorted(latency * 1000 for _, latency in results)
+        self.stdout.write(
+            f"{name}: {len(results)} requests in {elapsed:.2f}s, {len(results) / elapsed:.1f} req/s\n"
+            f"  latency ms  p50 {percentile(latencies, 50):.1f}  p95 {percentile(latencies, 95):.1f}  "
+            f"p99 {percentile(latencies, 99):.1f}  max {latencies[-1]:.1f}\n"
+            f"  outcomes    {', '.join(f'{k}: {v}' for k, v in sorted(outcomes.items(), key=str))}"
+        )
+        if monitor.samples:
+            waiting = sum(1 for count in monitor.samples if count)
+            self.stdout.write(
+                f"  lock waits  {waiting}/{len(monitor.samples)} samples, "
+                f"at most {max(monitor.samples)} waiting"
+            )
+
+    def get_deadlocks(self):
+        if connection.vendor != "postgresql":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()"
+            )
+            return cursor.fetchone()[0]
+
+    def check_invariants(self, product, stock, buyer_ids):
+        violations = []
+        product.refresh_from_db()
+        if product.quantity < 0:
+            violations.append(f"product quantity is {product.quantity}")
+
+        duplicates = (
+            OrderItem.objects.filter(user__in=buyer_ids, product=product, order=None)
+            .values("user")
+            .annotate(lines=Count("id"))
+            .filter(lines__gt=1)
+            .count()
+        )
+        if duplicates:
+            violations.append(f"{duplicates} buyers have duplicate cart lines")
+        duplicates = (
+            Order.items.through.objects.filter(order__user__in=buyer_ids, orderitem__product=product)
+            .values("order")
+            .annotate(lines=Count("id"))
+            .filter(lines__gt=1)
+            .count()
+        )
+        if duplicates:
+            violations.append(f"{duplicates} orders have duplicate lines")
+
+        units = list(
+            Order.objects.filter(user__in=buyer_ids, items__product=product)
+            .values("id")
+            .annotate(units=Sum("items__quantity"))
+            .values_list("units", flat=True)
+        )
+        oversized = sum(1 for count in units if count > stock)
+        if oversized:
+            violations.append(f"{oversized} orders contain more than the {stock} units in stock")
+        if sum(units) > stock:
+            violations.append(f"{len(units)} orders sold {sum(units)} of {stock} units")
+
+        self.stdout.write(
+            f"orders: {len(units)} placed, {sum(units)} units sold, {product.quantity} left in stock"
+        )
+        return violations
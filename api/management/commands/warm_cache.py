@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import warming
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the cache after a deploy or flush by replaying CACHE_WARM_URLS, or "
+        "the given URLs or the most requested ones in an access log, and "
+        "caching the CACHE_WARM_PRODUCTS products."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="*")
+        parser.add_argument("--from-log", default=None, help="Access log to take URLs from.")
+        parser.add_argument("--top", type=int, default=50)
+        parser.add_argument("--origin", default=None, help="App server to request, e.g. http://localhost:8000.")
+        parser.add_argument("--host", default=None)
+        parser.add_argument("--concurrency", type=int, default=None)
+        parser.add_argument("--skip-products", action="store_true")
+
+    def handle(self, *args, **options):
+        urls = list(options["urls"])
+        if options["from_log"]:
+            with open(options["from_log"], encoding="utf-8", errors="replace") as log:
+                urls.extend(warming.get_logged_urls(log, top=options["top"]))
+        if not urls:
+            urls = settings.CACHE_WARM_URLS
+
+        results = warming.warm_urls(
+            list(dict.fromkeys(urls)),
+            origin=options["origin"],
+            host=options["host"],
+            concurrency=options["concurrency"],
+        )
+        for url, status, seconds in results:
+            style = self.style.SUCCESS if status == 200 else self.style.WARNING
+            self.stdout.write(style(f"{status or 'ERR'} {seconds * 1000:7.1f} ms  {url}"))
+
+        if not options["skip_products"]:
+            count = warming.warm_products()
+            self.stdout.write(self.style.SUCCESS(f"Cached {count} products."))
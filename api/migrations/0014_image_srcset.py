@@ -0,0 +1,23 @@
+# Generated by Django 4.2.11 on 2026-10-19 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_order_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='srcset',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='srcset',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
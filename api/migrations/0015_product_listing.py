@@ -0,0 +1,38 @@
+# Generated by Django 4.2.11 on 2026-10-19 08:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_image_srcset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductListing',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('data', models.TextField()),
+                ('surrogate_keys', models.TextField(default='')),
+                ('name', models.CharField(max_length=150)),
+                ('datetime_created', models.DateTimeField()),
+                ('is_available', models.BooleanField(default=True)),
+                ('price', models.PositiveIntegerField()),
+                ('featured', models.BooleanField(default=False)),
+                ('stars', models.IntegerField(default=0)),
+                ('reviews', models.IntegerField(default=0)),
+                ('views', models.PositiveBigIntegerField(default=0)),
+                ('cart_adds', models.PositiveBigIntegerField(default=0)),
+                ('trending', models.FloatField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.category')),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.product')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.vendor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-views'], name='listing_views_idx'), models.Index(fields=['-trending'], name='listing_trending_idx'), models.Index(fields=['price'], name='listing_price_idx')],
+            },
+        ),
+    ]
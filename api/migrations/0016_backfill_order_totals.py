@@ -0,0 +1,44 @@
+from django.db import migrations, models
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+BATCH_SIZE = 1000
+
+
+def backfill_order_totals(apps, schema_editor):
+    # Orders placed before checkout snapshotted their totals, summed from
+    # their lines at today's prices as the API has been reporting them.
+    Order = apps.get_model("api", "Order")
+    line_total = models.ExpressionWrapper(
+        F("items__quantity") * F("items__product__price"),
+        output_field=models.PositiveIntegerField(),
+    )
+    pending = Order.objects.filter(Q(total_amount=None) | Q(item_count=None)).order_by("pk")
+
+    while True:
+        orders = list(
+            pending.annotate(
+                total=Coalesce(Sum(line_total), 0),
+                total_items=Coalesce(Sum("items__quantity"), 0),
+            )[:BATCH_SIZE]
+        )
+        if not orders:
+            break
+        for order in orders:
+            if order.total_amount is None:
+                order.total_amount = order.total
+            if order.item_count is None:
+                order.item_count = order.total_items
+        Order.objects.bulk_update(orders, ["total_amount", "item_count"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_product_listing'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_totals, migrations.RunPython.noop),
+    ]
@@ -5,11 +5,12 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.dispatch import receiver
 from django.db.models.signals import post_save
+from django.utils import timezone
 
 from rest_framework.authtoken.models import Token
 
 from cloudinary.models import CloudinaryField
-from .managers import CustomUserManager
+from .managers import CustomUserManager, OrderQuerySet
 
 
 def validate_acct_no(value):
@@ -55,6 +56,7 @@ class Image(models.Model):
         "Product", related_name="images", on_delete=models.CASCADE
     )
     url = CloudinaryField("image_url")
+    srcset = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return self.url
@@ -65,6 +67,7 @@ class Product(models.Model):
         "self", on_delete=models.CASCADE, related_name="variants", blank=True, null=True
     )
     display_image = CloudinaryField("display_image")
+    srcset = models.JSONField(default=dict, blank=True, editable=False)
     name = models.CharField(max_length=150)
     datetime_created = models.DateTimeField(auto_now_add=True)
     category = models.ForeignKey("Category", on_delete=models.CASCADE)
@@ -77,6 +80,15 @@ class Product(models.Model):
     featured = models.BooleanField(default=False)
     stars = models.IntegerField(default=0)
     reviews = models.IntegerField(default=0)
+    views = models.PositiveBigIntegerField(default=0)
+    cart_adds = models.PositiveBigIntegerField(default=0)
+    trending = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-views"], name="product_views_idx"),
+            models.Index(fields=["-trending"], name="product_trending_idx"),
+        ]
 
     def __str__(self):
         return "{} ({} NGN)".format(self.name, self.price/100)
@@ -86,9 +98,13 @@ class OrderItem(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="items")
     quantity = models.PositiveIntegerField(default=1)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    datetime_updated = models.DateTimeField(auto_now=True)
+    # The unit price at checkout; null on cart lines and older orders.
+    price = models.PositiveIntegerField(null=True, editable=False)
 
     def get_total_amount(self):
-        return self.product.price * self.quantity
+        price = self.product.price if self.price is None else self.price
+        return price * self.quantity
 
 
 class Order(models.Model):
@@ -99,6 +115,20 @@ class Order(models.Model):
     user = models.ForeignKey(User, null=True, on_delete=models.SET_NULL)
     items = models.ManyToManyField(OrderItem, blank=True)
     completed = models.BooleanField(default=False)
+    datetime_completed = models.DateTimeField(null=True, blank=True)
+    item_count = models.PositiveIntegerField(default=0)
+    total_amount = models.PositiveIntegerField(default=0)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["datetime_created"],
+                condition=models.Q(completed=True),
+                name="order_completed_created_idx",
+            )
+        ]
 
 
 class Size(models.Model):
@@ -140,6 +170,190 @@ class Review(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
 
 
+class VendorDailySales(models.Model):
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name="daily_sales")
+    day = models.DateField()
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["vendor", "day"], name="unique_vendor_day")
+        ]
+
+
+class ProductDailySales(models.Model):
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="daily_sales")
+    day = models.DateField()
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "day"], name="unique_product_day")
+        ]
+        indexes = [models.Index(fields=["vendor", "day"])]
+
+
+class OutboxEvent(models.Model):
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (DONE, "Done"), (FAILED, "Failed")]
+
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    datetime_created = models.DateTimeField(auto_now_add=True)
+    datetime_processed = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["available_at"],
+                condition=models.Q(status="pending"),
+                name="outbox_pending_idx",
+            )
+        ]
+
+    def __str__(self):
+        return "{} ({})".format(self.topic, self.status)
+
+
+class ProductPairCount(models.Model):
+    """Completed orders containing both products; `product == other` counts the product alone."""
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "other"], name="unique_product_pair")
+        ]
+
+
+class RelatedProduct(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "rank"], name="unique_related_rank")
+        ]
+
+
+class JobCursor(models.Model):
+    """Where a resumable batch job left off."""
+
+    name = models.CharField(max_length=100, unique=True)
+    value = models.CharField(max_length=255, blank=True)
+    datetime_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return "{} ({})".format(self.name, self.value)
+
+
+class ArchivedOrderItem(models.Model):
+    """An `OrderItem` of an archived order, keeping its original id."""
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    quantity = models.PositiveIntegerField(default=1)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    datetime_updated = models.DateTimeField()
+    price = models.PositiveIntegerField(null=True, editable=False)
+
+    def get_total_amount(self):
+        price = self.product.price if self.price is None else self.price
+        return price * self.quantity
+
+
+class ArchivedOrder(models.Model):
+    """A completed `Order` moved out of the hot table by `api.archive`."""
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    datetime_created = models.DateTimeField()
+    user = models.ForeignKey(
+        User, null=True, on_delete=models.SET_NULL, related_name="archived_orders"
+    )
+    items = models.ManyToManyField(ArchivedOrderItem, blank=True)
+    completed = models.BooleanField(default=True)
+    datetime_completed = models.DateTimeField(null=True, blank=True)
+    item_count = models.PositiveIntegerField(default=0)
+    total_amount = models.PositiveIntegerField(default=0)
+    datetime_archived = models.DateTimeField(auto_now_add=True)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["datetime_created"], name="archived_order_created_idx"),
+            models.Index(fields=["user", "datetime_created"], name="archived_order_user_idx"),
+        ]
+
+
+class ScheduledJob(models.Model):
+    """Schedule, lease and run statistics of a periodic job."""
+
+    name = models.CharField(max_length=100, unique=True)
+    next_run_at = models.DateTimeField(default=timezone.now)
+    lease_owner = models.CharField(max_length=100, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    last_started = models.DateTimeField(null=True, blank=True)
+    last_finished = models.DateTimeField(null=True, blank=True)
+    last_duration = models.FloatField(null=True, blank=True)
+    last_result = models.BigIntegerField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    runs = models.PositiveIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0)
+    total_duration = models.FloatField(default=0)
+
+    def __str__(self):
+        return self.name
+
+
+class ProductListing(models.Model):
+    """
+    One row per product serving the product list without joins: the list
+    JSON rendered by `api.listing`, its CDN surrogate keys and the columns
+    it is filtered and ordered by. `id` is the product's id.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    data = models.TextField()
+    surrogate_keys = models.TextField(default="")
+    parent = models.ForeignKey(
+        Product, null=True, blank=True, on_delete=models.CASCADE, related_name="+"
+    )
+    name = models.CharField(max_length=150)
+    datetime_created = models.DateTimeField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="+")
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name="+")
+    is_available = models.BooleanField(default=True)
+    price = models.PositiveIntegerField()
+    featured = models.BooleanField(default=False)
+    stars = models.IntegerField(default=0)
+    reviews = models.IntegerField(default=0)
+    views = models.PositiveBigIntegerField(default=0)
+    cart_adds = models.PositiveBigIntegerField(default=0)
+    trending = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-views"], name="listing_views_idx"),
+            models.Index(fields=["-trending"], name="listing_trending_idx"),
+            models.Index(fields=["price"], name="listing_price_idx"),
+        ]
+
+
 @receiver(post_save, sender=User)
 def create_token(sender, instance, created, **kwargs):
     if created:
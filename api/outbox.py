@@ -0,0 +1,99 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, OutboxEvent
+
+
+logger = logging.getLogger(__name__)
+
+ORDER_CREATED = "order.created"
+
+_handlers = defaultdict(list)
+
+
+def handler(topic):
+    """Register the decorated function to receive the payload of `topic` events."""
+
+    def register(func):
+        _handlers[topic].append(func)
+        return func
+
+    return register
+
+
+def publish(topic, payload):
+    """
+    Record an event to be dispatched later. Call it inside the transaction
+    that writes the data the event describes so both commit or neither does.
+    """
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def get_backoff(attempts):
+    delay = settings.OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.OUTBOX_MAX_RETRY_DELAY))
+
+
+def claim(batch_size):
+    """
+    Lease up to `batch_size` due events, skipping rows other dispatchers have
+    locked, and count the attempt. Leased events stay hidden from other
+    dispatchers for `OUTBOX_CLAIM_TIMEOUT` seconds, after which the events
+    of a dispatcher that died are due again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEvent.PENDING, available_at__lte=now)
+            .order_by("available_at")[:batch_size]
+        )
+        for event in events:
+            event.attempts += 1
+            event.available_at = now + timedelta(seconds=settings.OUTBOX_CLAIM_TIMEOUT)
+        OutboxEvent.objects.bulk_update(events, ["attempts", "available_at"])
+    return events
+
+
+def dispatch(batch_size=None):
+    """
+    Claim up to `batch_size` due events and run their handlers, each event in
+    its own transaction that also marks it done, outside the claim's locks.
+    Failed events are retried with exponential backoff until
+    `OUTBOX_MAX_ATTEMPTS` is reached. Returns the number of events claimed.
+    """
+    events = claim(batch_size or settings.OUTBOX_BATCH_SIZE)
+
+    for event in events:
+        try:
+            with transaction.atomic():
+                for func in _handlers[event.topic]:
+                    func(event.payload)
+                event.status = OutboxEvent.DONE
+                event.datetime_processed = timezone.now()
+                event.save(update_fields=["status", "datetime_processed"])
+        except Exception as exc:
+            logger.exception("Outbox event %s (%s) failed", event.pk, event.topic)
+            event.status = OutboxEvent.PENDING
+            event.last_error = repr(exc)
+            if event.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                event.status = OutboxEvent.FAILED
+            else:
+                event.available_at = timezone.now() + get_backoff(event.attempts)
+            event.save(update_fields=["status", "last_error", "available_at"])
+    return len(events)
+
+
+@handler(ORDER_CREATED)
+def add_order_customers(payload):
+    order = Order.objects.select_related("user").get(pk=payload["order"])
+    if order.user is None:
+        return
+
+    products = order.items.values_list("product", flat=True)
+    order.user.users.add(*products)
@@ -1,5 +1,42 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
 from rest_framework import permissions
-from .models import Product
+from .models import Product, Vendor
+
+
+def get_vendor_ids(request):
+    """
+    Return the ids of the vendors owned by `request.user`, computed once per
+    request and cached per user until one of their vendors changes.
+    """
+    vendor_ids = getattr(request, "_vendor_ids", None)
+    if vendor_ids is None:
+        key = f"vendor_ids:{request.user.pk}"
+        vendor_ids = cache.get(key)
+        if vendor_ids is None:
+            vendor_ids = set(
+                Vendor.objects.filter(user=request.user).values_list("id", flat=True)
+            )
+            cache.set(key, vendor_ids)
+        request._vendor_ids = vendor_ids
+    return vendor_ids
+
+
+@receiver(pre_save, sender=Vendor)
+def remember_vendor_user(sender, instance, raw, **kwargs):
+    # A vendor moved to another user leaves the previous user's ids stale too.
+    if not raw and not instance._state.adding:
+        instance._previous_user_id = (
+            Vendor.objects.filter(pk=instance.pk).values_list("user_id", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+def clear_vendor_ids(sender, instance, **kwargs):
+    user_ids = {instance.user_id, getattr(instance, "_previous_user_id", None)}
+    cache.delete_many([f"vendor_ids:{pk}" for pk in user_ids if pk is not None])
 
 
 class IsUser(permissions.BasePermission):
@@ -19,7 +56,16 @@ class IsVendor(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         item = obj.product if hasattr(obj, "product") else obj
-        return bool(request.user == item.vendor.user)
+        return item.vendor_id in get_vendor_ids(request)
+
+
+class IsVendorOwner(permissions.BasePermission):
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated)
+
+    def has_object_permission(self, request, view, obj):
+        return bool(request.user == obj.user)
 
 
 class IsAVendor(permissions.BasePermission):
@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+
+from . import typeahead
+from .cache import get_redis_client
+from .models import Product, ProductListing
+
+
+VIEWS = "views"
+CART_ADDS = "cart_adds"
+REDIS_KEYS = {VIEWS: "popularity:views", CART_ADDS: "popularity:cart_adds"}
+# The product list read model keeps its own copy of the counters.
+COUNTED_MODELS = (Product, ProductListing)
+
+_lock = threading.Lock()
+_buffer = {VIEWS: Counter(), CART_ADDS: Counter()}
+_last_flush = time.monotonic()
+
+
+def record(product_id, kind=VIEWS):
+    """
+    Count a view or add-to-cart for `product_id` without touching the
+    database. Counts go to a Redis hash when the cache is Redis, otherwise to
+    a per-process buffer that is flushed from here once per flush interval.
+    """
+    client = get_redis_client()
+    if client is not None:
+        client.hincrby(REDIS_KEYS[kind], product_id, 1)
+        return
+
+    global _last_flush
+    with _lock:
+        _buffer[kind][int(product_id)] += 1
+        due = time.monotonic() - _last_flush >= settings.POPULARITY_FLUSH_INTERVAL
+        if due:
+            _last_flush = time.monotonic()
+
+    if due:
+        flush()
+
+
+def drain():
+    client = get_redis_client()
+    if client is not None:
+        pipe = client.pipeline()
+        for key in REDIS_KEYS.values():
+            pipe.hgetall(key)
+        for key in REDIS_KEYS.values():
+            pipe.delete(key)
+        results = pipe.execute()
+        return {
+            kind: Counter({int(pk): int(count) for pk, count in counts.items()})
+            for kind, counts in zip(REDIS_KEYS, results)
+        }
+
+    with _lock:
+        counts = {kind: counter.copy() for kind, counter in _buffer.items()}
+        for counter in _buffer.values():
+            counter.clear()
+    return counts
+
+
+def flush(batch_size=None):
+    """Write buffered counts to `Product` in batched UPDATEs. Returns rows touched."""
+    batch_size = batch_size or settings.POPULARITY_BATCH_SIZE
+    counts = drain()
+    views, cart_adds = counts[VIEWS], counts[CART_ADDS]
+    product_ids = sorted(set(views) | set(cart_adds))
+    weight = settings.POPULARITY_CART_WEIGHT
+
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start : start + batch_size]
+        updates = {
+            "views": F("views") + _deltas(batch, views, IntegerField()),
+            "cart_adds": F("cart_adds") + _deltas(batch, cart_adds, IntegerField()),
+            "trending": F("trending") + _deltas(
+                batch,
+                {pk: views[pk] + weight * cart_adds[pk] for pk in batch},
+                FloatField(),
+            ),
+        }
+        with transaction.atomic():
+            for model in COUNTED_MODELS:
+                model.objects.filter(pk__in=batch).update(**updates)
+        typeahead.refresh_scores(batch)
+    return len(product_ids)
+
+
+def _deltas(batch, counts, output_field):
+    whens = [When(pk=pk, then=Value(counts[pk])) for pk in batch if counts[pk]]
+    return Case(*whens, default=Value(0), output_field=output_field)
+
+
+def decay(elapsed):
+    """
+    Decay trending scores by the time elapsed since the last decay, using
+    `POPULARITY_HALF_LIFE` seconds as the half-life. Scores that fall below
+    `POPULARITY_MIN_SCORE` are reset to zero so only live rows are rewritten.
+    """
+    factor = 0.5 ** (elapsed / settings.POPULARITY_HALF_LIFE)
+    minimum = settings.POPULARITY_MIN_SCORE
+
+    with transaction.atomic():
+        for model in COUNTED_MODELS:
+            model.objects.filter(trending__gt=0, trending__lt=minimum / factor).update(
+                trending=0
+            )
+            model.objects.filter(trending__gte=minimum / factor).update(
+                trending=F("trending") * factor
+            )
@@ -0,0 +1,111 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from rest_framework.authtoken.models import Token
+
+from .models import User
+from .serializers import UserImportSerializer
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _hash_passwords(passwords, pool, workers):
+    if pool is None:
+        return [make_password(password) for password in passwords]
+    chunksize = max(len(passwords) // (workers * 4), 1)
+    return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+def _provision_batch(rows, offset, pool, workers, report):
+    valid = []
+    for i, row in enumerate(rows, start=offset):
+        serializer = UserImportSerializer(data=row)
+        if serializer.is_valid():
+            valid.append(serializer.validated_data)
+        else:
+            report["errors"].append({"row": i, "errors": serializer.errors})
+
+    seen = set()
+    existing = set(
+        User.objects.filter(email__in=[data["email"] for data in valid]).values_list(
+            "email", flat=True
+        )
+    )
+    fresh = []
+    for data in valid:
+        if data["email"] in existing or data["email"] in seen:
+            report["skipped"].append(data["email"])
+        else:
+            seen.add(data["email"])
+            fresh.append(data)
+
+    # Plain passwords are hashed with the default hasher in worker processes;
+    # legacy hashes are stored as they are and upgraded on first login.
+    plain = [data for data in fresh if "password_hash" not in data]
+    hashes = _hash_passwords([data.get("password", None) for data in plain], pool, workers)
+    for data, password_hash in zip(plain, hashes):
+        data["password_hash"] = password_hash
+
+    users = [
+        User(
+            email=data["email"],
+            password=data["password_hash"],
+            first_name=data.get("first_name", ""),
+            last_name=data.get("last_name", ""),
+            phone_number=data.get("phone_number", ""),
+            is_vendor=data.get("is_vendor", False),
+        )
+        for data in fresh
+    ]
+    # bulk_create skips the post_save `create_token` receiver, so the tokens
+    # are created here in the same transaction. Emails registered since the
+    # check above are skipped and the rest of the batch inserted again.
+    while users:
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                Token.objects.bulk_create(
+                    [Token(key=Token.generate_key(), user=user) for user in users]
+                )
+            break
+        except IntegrityError:
+            taken = set(
+                User.objects.filter(email__in=[user.email for user in users]).values_list(
+                    "email", flat=True
+                )
+            )
+            if not taken:
+                raise
+            report["skipped"].extend(user.email for user in users if user.email in taken)
+            users = [user for user in users if user.email not in taken]
+    report["created"] += len(users)
+
+
+def provision_users(rows, batch_size=None, workers=None):
+    """
+    Create users and their auth tokens from an iterable of dicts with
+    `email` and either `password` or a Django-encoded `password_hash`, plus
+    optional `first_name`, `last_name`, `phone_number` and `is_vendor`.
+    Rows are validated, hashed and inserted `batch_size` at a time. Existing
+    emails are skipped. Returns {"created", "skipped", "errors"}.
+    """
+    batch_size = batch_size or settings.USER_IMPORT_BATCH_SIZE
+    workers = workers or settings.USER_IMPORT_WORKERS or os.cpu_count() or 1
+    report = {"created": 0, "skipped": [], "errors": []}
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for n, rows_batch in enumerate(_chunks(rows, batch_size)):
+            _provision_batch(rows_batch, n * batch_size, pool, workers, report)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return report
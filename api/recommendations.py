@@ -0,0 +1,168 @@
+import heapq
+import itertools
+import math
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ArchivedOrder, JobCursor, Order, ProductPairCount, RelatedProduct
+
+CURSOR_NAME = "recommendations"
+BASKET_FIELDS = {
+    Order: ("order_id", "orderitem__product_id"),
+    ArchivedOrder: ("archivedorder_id", "archivedorderitem__product_id"),
+}
+
+
+def count_pairs(rows):
+    """
+    Count, for every pair of products, the orders containing both, given
+    (order_id, product_id) rows. Pairs include (p, p), the number of orders
+    containing p. Building the counts dominates at any basket size, so this
+    keeps up with a sparse matrix product (`manage.py benchmark_recommendations`).
+    """
+    baskets = defaultdict(set)
+    for order_id, product_id in rows:
+        baskets[order_id].add(product_id)
+
+    counts = Counter()
+    for products in baskets.values():
+        counts.update(itertools.product(products, repeat=2))
+    return counts
+
+
+def iter_baskets(orders, batch_size):
+    """
+    Yield the (order_id, product_id) rows of `orders`, an `Order` or
+    `ArchivedOrder` queryset, for `batch_size` orders at a time.
+    """
+    order_field, product_field = BASKET_FIELDS[orders.model]
+    through = orders.model.items.through
+    orders = orders.order_by("pk")
+
+    while True:
+        ids = list(orders.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return
+        yield list(
+            through.objects.filter(**{f"{order_field}__in": ids}).values_list(
+                order_field, product_field
+            )
+        )
+        orders = orders.filter(pk__gt=ids[-1])
+
+
+def apply_counts(counts, batch_size=1000):
+    """Add `counts` to the stored pair counts."""
+    counts = Counter(counts)
+    products = sorted({product for product, _ in counts})
+    for start in range(0, len(products), batch_size):
+        existing = ProductPairCount.objects.filter(
+            product__in=products[start : start + batch_size]
+        ).values_list("product", "other", "count")
+        for product, other, count in existing:
+            if (product, other) in counts:
+                counts[(product, other)] += count
+
+    pairs = [
+        ProductPairCount(product_id=product, other_id=other, count=count)
+        for (product, other), count in counts.items()
+    ]
+    ProductPairCount.objects.bulk_create(
+        pairs,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["product", "other"],
+        update_fields=["count"],
+    )
+
+
+def refresh_related(product_ids, top_k, batch_size=500):
+    """
+    Recompute the top `top_k` neighbours of `product_ids`, scored by the cosine
+    similarity of their order sets: both / sqrt(orders(a) * orders(b)).
+    """
+    product_ids = sorted(product_ids)
+
+    for start in range(0, len(product_ids), batch_size):
+        chunk = product_ids[start : start + batch_size]
+        neighbours = defaultdict(list)
+        for product, other, count in ProductPairCount.objects.filter(
+            product__in=chunk
+        ).values_list("product", "other", "count"):
+            neighbours[product].append((other, count))
+
+        others = {other for pairs in neighbours.values() for other, _ in pairs}
+        totals = dict(
+            ProductPairCount.objects.filter(
+                product=F("other"), product__in=others
+            ).values_list("product", "count")
+        )
+
+        related = []
+        for product, pairs in neighbours.items():
+            scored = (
+                (count / math.sqrt(totals[product] * totals[other]), other)
+                for other, count in pairs
+                if other != product and totals.get(other) and totals.get(product)
+            )
+            for rank, (score, other) in enumerate(heapq.nlargest(top_k, scored)):
+                related.append(
+                    RelatedProduct(product_id=product, related_id=other, score=score, rank=rank)
+                )
+
+        with transaction.atomic():
+            RelatedProduct.objects.filter(product__in=chunk).delete()
+            RelatedProduct.objects.bulk_create(related)
+
+
+def build(full=False, top_k=None, batch_size=None):
+    """
+    Fold orders completed since the last run into the pair counts and refresh
+    the neighbours of the products they touched. `full` recounts every
+    completed order. Orders are read `batch_size` at a time, and those
+    completed in the last RECOMMENDATIONS_SETTLE seconds are left for the
+    next run, so an order whose transaction commits after the run started
+    is not skipped. Returns the number of products refreshed.
+    """
+    top_k = top_k or settings.RECOMMENDATIONS_TOP_K
+    batch_size = batch_size or settings.RECOMMENDATIONS_BATCH_SIZE
+    cursor, _ = JobCursor.objects.get_or_create(name=CURSOR_NAME)
+    until = timezone.now() - timedelta(seconds=settings.RECOMMENDATIONS_SETTLE)
+
+    orders = Order.objects.filter(completed=True)
+    if full or not cursor.value:
+        full = True
+        sources = [
+            orders.filter(Q(datetime_completed__lte=until) | Q(datetime_completed=None)),
+            ArchivedOrder.objects.all(),
+        ]
+    else:
+        sources = [
+            orders.filter(
+                datetime_completed__gt=parse_datetime(cursor.value),
+                datetime_completed__lte=until,
+            )
+        ]
+
+    products = set()
+    with transaction.atomic():
+        if full:
+            ProductPairCount.objects.all().delete()
+        for source in sources:
+            for rows in iter_baskets(source, batch_size):
+                counts = count_pairs(rows)
+                apply_counts(counts)
+                products.update(product for product, _ in counts)
+        cursor.value = until.isoformat()
+        cursor.save()
+
+    if full:
+        RelatedProduct.objects.all().delete()
+    refresh_related(products, top_k)
+    return len(products)
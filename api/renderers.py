@@ -0,0 +1,80 @@
+import json
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class RawJSON(str):
+    """
+    An object rendered to compact JSON ahead of time, e.g. a `ProductListing`
+    row. `FastJSONRenderer` copies it into the response as is; `api.cdn`
+    reads its `surrogate_keys` instead of walking it.
+    """
+
+    def __new__(cls, text, surrogate_keys=()):
+        self = super().__new__(cls, text)
+        self.surrogate_keys = surrogate_keys
+        return self
+
+
+def get_raw_results(data):
+    """The list of `RawJSON` in `data`, a list or a page of results, or None."""
+    results = data.get("results", None) if isinstance(data, dict) else data
+    if isinstance(results, list) and results and all(isinstance(item, RawJSON) for item in results):
+        return results
+    return None
+
+
+def decode(data):
+    """`data`, a list or a page of `RawJSON` results, with the results parsed."""
+    if isinstance(data, list):
+        return [json.loads(item) for item in data]
+    return {**data, "results": decode(data["results"])}
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    `JSONRenderer` that encodes with orjson when it is installed. UUIDs and
+    datetimes are encoded natively; anything orjson does not know (Decimal,
+    lazy translations, querysets...) goes through DRF's `JSONEncoder`.
+    Indented or ASCII-escaped output, and installs without orjson, use
+    `JSONRenderer` itself. orjson writes NaN and infinities as null.
+
+    Lists and pages of `RawJSON` results are joined without decoding them,
+    unless the output is indented or ASCII-escaped.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        plain = self.ensure_ascii or not self.compact or (
+            self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        )
+        results = get_raw_results(data)
+        if results is not None:
+            if plain:
+                return super().render(decode(data), accepted_media_type, renderer_context)
+            return self.render_raw(data, results, accepted_media_type, renderer_context)
+
+        if orjson is None or data is None or plain:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z,
+        )
+        # Escaped like JSONRenderer's output, to stay a strict javascript subset.
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+    def render_raw(self, data, results, accepted_media_type, renderer_context):
+        body = b"[" + ",".join(results).encode() + b"]"
+        if isinstance(data, list):
+            return body
+        # "results" is rendered last, as null, and replaced by the joined rows.
+        envelope = {key: value for key, value in data.items() if key != "results"}
+        envelope["results"] = None
+        ret = self.render(envelope, accepted_media_type, renderer_context)
+        return ret[: -len(b"null}")] + body + b"}"
@@ -0,0 +1,186 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ScheduledJob
+
+
+logger = logging.getLogger(__name__)
+
+_jobs = {}
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[["Run"], Optional[int]]
+    interval: int
+    batch_size: Optional[int] = None
+    time_budget: Optional[int] = None
+
+    def get_option(self, option):
+        return settings.SCHEDULER_JOBS.get(self.name, {}).get(option, getattr(self, option))
+
+    @property
+    def lease(self):
+        return max(settings.SCHEDULER_LEASE, (self.get_option("time_budget") or 0) * 2)
+
+
+class Run:
+    """
+    What a job gets to work with: `batch_size`, the time left in its budget
+    and when it last started. Jobs process one batch at a time and return
+    once `expired()` after a batch; the scheduler then runs them again on the
+    next tick.
+    """
+
+    def __init__(self, batch_size=None, time_budget=None, last_started=None):
+        self.batch_size = batch_size
+        self.deadline = None if time_budget is None else time.monotonic() + time_budget
+        self.last_started = last_started
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+
+def job(interval, name=None, batch_size=None, time_budget=None):
+    """
+    Register the decorated function to run every `interval` seconds. It is
+    called with a `Run` and may return a count to record. `batch_size` and
+    `time_budget` can be overridden per job name in `SCHEDULER_JOBS`.
+    """
+
+    def register(func):
+        job_name = name or func.__name__
+        _jobs[job_name] = Job(job_name, func, interval, batch_size, time_budget)
+        return func
+
+    return register
+
+
+def get_jobs():
+    return dict(_jobs)
+
+
+def get_owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def claim(job, owner, force=False):
+    """
+    Take the job's lease if it is due (or `force`) and no other node holds an
+    unexpired lease. The conditional UPDATE makes this safe across nodes.
+    Returns the job's previous start time, or False if it was not claimed.
+    """
+    now = timezone.now()
+    state, _ = ScheduledJob.objects.get_or_create(name=job.name, defaults={"next_run_at": now})
+
+    claimable = ScheduledJob.objects.filter(pk=state.pk).filter(
+        Q(lease_expires_at=None) | Q(lease_expires_at__lte=now)
+    )
+    if not force:
+        claimable = claimable.filter(next_run_at__lte=now)
+
+    claimed = claimable.update(
+        lease_owner=owner,
+        lease_expires_at=now + timedelta(seconds=job.lease),
+        last_started=now,
+    )
+    return state.last_started if claimed else False
+
+
+@contextmanager
+def keep_lease(job, owner):
+    """
+    Extend the job's lease every third of its length while the block runs,
+    so jobs that outlast it, such as those without a time budget, are not
+    claimed by another node meanwhile.
+    """
+    stopped = threading.Event()
+
+    def renew():
+        try:
+            while not stopped.wait(job.lease / 3):
+                ScheduledJob.objects.filter(name=job.name, lease_owner=owner).update(
+                    lease_expires_at=timezone.now() + timedelta(seconds=job.lease)
+                )
+        except Exception:
+            logger.exception("Could not renew the lease of scheduled job %s", job.name)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=renew, name=f"lease:{job.name}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def run_job(job, owner, force=False, batch_size=None, time_budget=None):
+    """
+    Run `job` under a lease and record its duration, result or error.
+    Returns True if this node ran it.
+    """
+    last_started = claim(job, owner, force)
+    if last_started is False:
+        return False
+
+    started = timezone.now()
+    run = Run(
+        job.get_option("batch_size") if batch_size is None else batch_size,
+        job.get_option("time_budget") if time_budget is None else time_budget,
+        last_started,
+    )
+    clock = time.monotonic()
+    result, error = None, ""
+
+    try:
+        with keep_lease(job, owner):
+            result = job.func(run)
+    except Exception as exc:
+        logger.exception("Scheduled job %s failed", job.name)
+        error = repr(exc)
+    duration = time.monotonic() - clock
+
+    # A job that ran out of budget has more work waiting, so it runs again
+    # on the next tick instead of after its interval.
+    next_run_at = started if run.expired() and not error else started + timedelta(
+        seconds=job.get_option("interval")
+    )
+    ScheduledJob.objects.filter(name=job.name).update(
+        next_run_at=next_run_at,
+        last_finished=timezone.now(),
+        last_duration=duration,
+        last_result=result if isinstance(result, int) else None,
+        last_error=error,
+        runs=F("runs") + 1,
+        failures=F("failures") + (1 if error else 0),
+        total_duration=F("total_duration") + duration,
+    )
+    ScheduledJob.objects.filter(name=job.name, lease_owner=owner).update(
+        lease_owner="", lease_expires_at=None
+    )
+    return True
+
+
+def run_pending(owner, names=None, **options):
+    """Run every due job, or the `names` given regardless of schedule. Returns jobs run."""
+    jobs = get_jobs()
+    if names:
+        return [name for name in names if run_job(jobs[name], owner, force=True, **options)]
+    return [name for name, job in jobs.items() if run_job(job, owner, **options)]
+
@@ -1,13 +1,23 @@
+from django.contrib.auth.hashers import identify_hasher
+from django.core.exceptions import ObjectDoesNotExist
+from rest_framework.relations import PKOnlyObject
 from rest_framework.serializers import (
+    BooleanField,
+    CharField,
+    EmailField,
+    IntegerField,
     ModelSerializer,
     PrimaryKeyRelatedField,
     RelatedField,
     ReadOnlyField,
     StringRelatedField,
-    SerializerMethodField,
+    Serializer,
     ValidationError,
 )
 
+from . import hotcache
+from .carts import checkout
+
 from .models import (
     Size,
     OrderItem,
@@ -22,16 +32,37 @@ from .models import (
 
 
 class CustomRelatedField(RelatedField):
+    default_error_messages = PrimaryKeyRelatedField.default_error_messages
 
     def __init__(self, **kwargs):
         self.serializer = kwargs.pop("serializer", None)
         self.display_fields = kwargs.pop("display_fields", None)
         super().__init__(**kwargs)
 
+    def use_pk_only_optimization(self):
+        # Categories and vendors are represented from `api.hotcache`, so the
+        # related row is not fetched.
+        return self.serializer is not None and hotcache.get_hot_objects(self.serializer) is not None
+
     def to_internal_value(self, data):
-        return self.queryset.get(pk=data)
+        # Held rows are checked against the version stamp first, so rows
+        # another process has deleted since they were loaded are looked up.
+        instance = hotcache.get_instance(self.queryset, data, check=True)
+        if instance is not None:
+            return instance
+        try:
+            return self.queryset.get(pk=data)
+        except ObjectDoesNotExist:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
 
     def to_representation(self, value):
+        data = hotcache.get_representations(self.serializer, [value.pk]).get(value.pk, None)
+        if data is not None:
+            return data
+        if isinstance(value, PKOnlyObject):
+            value = self.serializer.Meta.model._default_manager.get(pk=value.pk)
         return self.serializer(instance=value).data
 
 
@@ -116,6 +147,43 @@ class UserSerializer(ModelSerializer):
         }
 
 
+class UserImportSerializer(Serializer):
+    """
+    One row of a bulk user import. Unlike `UserSerializer` it runs no
+    per-row queries; duplicate emails are found in bulk by the importer.
+    """
+
+    email = EmailField()
+    password = CharField(required=False, write_only=True)
+    password_hash = CharField(required=False, write_only=True)
+    first_name = CharField(required=False, allow_blank=True, max_length=150)
+    last_name = CharField(required=False, allow_blank=True, max_length=150)
+    phone_number = CharField(
+        required=False,
+        allow_blank=True,
+        max_length=17,
+        validators=User._meta.get_field("phone_number").validators,
+    )
+    is_vendor = BooleanField(required=False, default=False)
+
+    def validate_email(self, value):
+        return User.objects.normalize_email(value)
+
+    def validate_password_hash(self, value):
+        try:
+            identify_hasher(value)
+        except ValueError:
+            raise ValidationError(
+                'Expected "<algorithm>$<hash>" for a hasher in PASSWORD_HASHERS.'
+            )
+        return value
+
+    def validate(self, attrs):
+        if "password" in attrs and "password_hash" in attrs:
+            raise ValidationError({"password_hash": ["Provide either password or password_hash."]})
+        return attrs
+
+
 class ProductSerializer(ModelSerializer):
 
     images = CustomRelatedField(many=True, serializer=ImageSerializer, read_only=True)
@@ -139,6 +207,9 @@ class ProductSerializer(ModelSerializer):
             "quantity": {"default": 1},
             "reviews": {"read_only": True},
             "stars": {"read_only": True},
+            "views": {"read_only": True},
+            "cart_adds": {"read_only": True},
+            "trending": {"read_only": True},
         }
 
 
@@ -183,6 +254,24 @@ class OrderItemSerializer(ModelSerializer):
         return super().update(instance, validated_data)
 
 
+class CartItemSerializer(Serializer):
+    id = ReadOnlyField(source="product")
+    user = ReadOnlyField()
+    product = IntegerField(min_value=1)
+    quantity = IntegerField(min_value=1, default=1)
+
+
+class StockChangeSerializer(Serializer):
+    product = IntegerField(min_value=1)
+    quantity = IntegerField(min_value=0, required=False)
+    delta = IntegerField(required=False)
+
+    def validate(self, attrs):
+        if ("quantity" in attrs) == ("delta" in attrs):
+            raise ValidationError({"delta": ["Provide exactly one of delta or quantity."]})
+        return attrs
+
+
 class OrderSerializer(ModelSerializer):
     user = ReadOnlyField(source="user.id")
     items = OrderItemSerializer(read_only=True, many=True)
@@ -190,13 +279,18 @@ class OrderSerializer(ModelSerializer):
     class Meta:
         model = Order
         fields = "__all__"
+        read_only_fields = ("item_count", "total_amount")
 
     def create(self, validated_data):
-        user = validated_data["user"]
-        items = user.items.all()
+        items = checkout(validated_data["user"])
 
-        if not items.exists():
+        if not items:
             raise ValidationError({"items": ["User's cart is empty!"]})
+
+        validated_data["item_count"] = sum(item.quantity for item in items)
+        validated_data["total_amount"] = sum(
+            item.get_total_amount() for item in items
+        )
         order = super().create(validated_data)
-        order.items.add(*user.items.all())
+        order.items.add(*items)
         return order
@@ -0,0 +1,128 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import BooleanField, Case, F, PositiveIntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.db.models.lookups import Exact
+
+from . import cdn, typeahead
+from .cache import invalidate_products
+from .listing import refresh_listings
+from .models import Product
+
+
+def get_owners(product_ids):
+    """Return {product_id: (vendor_id, is_available)} for the products that exist."""
+    return {
+        pk: (vendor_id, is_available)
+        for pk, vendor_id, is_available in Product.objects.filter(
+            pk__in=product_ids
+        ).values_list("id", "vendor_id", "is_available")
+    }
+
+
+def apply_stock(changes, was_available):
+    """
+    Apply {product_id: {"quantity": n} or {"delta": n}} in one UPDATE. Deltas
+    add to the current stock and never take it below zero. Products that
+    reach zero become unavailable and sold-out products that are restocked
+    become available again. `was_available` maps the products to their
+    previous availability, used to update the suggestion index. Returns the
+    updated {"id", "quantity", "is_available"} rows ordered by id.
+    """
+    connection = connections[Product.objects.db]
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            rows = _update_returning(connection, changes)
+        else:
+            rows = _update_case(changes)
+
+    refresh_listings(changes)
+    invalidate_products(changes)
+    cdn.purge_instances(Product, changes)
+    cache.delete_many([f"cart:stock:{pk}" for pk in changes])
+
+    flipped = [row["id"] for row in rows if row["is_available"] != was_available[row["id"]]]
+    if flipped:
+        transaction.on_commit(lambda: _reindex(flipped))
+    return rows
+
+
+def _update_returning(connection, changes):
+    """Join the changes in as arrays and read the new rows back with RETURNING."""
+    ids, absolute, values = [], [], []
+    for pk, change in changes.items():
+        ids.append(pk)
+        absolute.append("quantity" in change)
+        values.append(change["quantity"] if "quantity" in change else change["delta"])
+
+    quantity = "CASE WHEN c.absolute THEN c.value ELSE GREATEST(p.quantity + c.value, 0) END"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {connection.ops.quote_name(Product._meta.db_table)} AS p
+            SET quantity = {quantity},
+                is_available = CASE
+                    WHEN {quantity} = 0 THEN false
+                    WHEN p.quantity = 0 THEN true
+                    ELSE p.is_available
+                END
+            FROM unnest(%s::bigint[], %s::boolean[], %s::bigint[]) AS c(id, absolute, value)
+            WHERE p.id = c.id
+            RETURNING p.id, p.quantity, p.is_available
+            """,
+            [ids, absolute, values],
+        )
+        rows = cursor.fetchall()
+
+    return [
+        {"id": pk, "quantity": quantity, "is_available": is_available}
+        for pk, quantity, is_available in sorted(rows)
+    ]
+
+
+def _update_case(changes):
+    # One WHEN per distinct value rather than per product keeps the CASE short:
+    # warehouse pushes repeat the same few deltas and stock levels.
+    groups = defaultdict(list)
+    for pk, change in changes.items():
+        kind = "quantity" if "quantity" in change else "delta"
+        groups[(kind, change[kind])].append(pk)
+
+    quantity = Case(
+        *(
+            When(
+                pk__in=ids,
+                then=Value(value)
+                if kind == "quantity"
+                else Greatest(F("quantity") + value, 0),
+            )
+            for (kind, value), ids in groups.items()
+        ),
+        default=F("quantity"),
+        output_field=PositiveIntegerField(),
+    )
+    # Both CASEs read the row as it was before the UPDATE.
+    is_available = Case(
+        When(Exact(quantity, 0), then=Value(False)),
+        When(quantity=0, then=Value(True)),
+        default=F("is_available"),
+        output_field=BooleanField(),
+    )
+
+    Product.objects.filter(pk__in=changes).update(
+        quantity=quantity, is_available=is_available
+    )
+    return list(
+        Product.objects.filter(pk__in=changes)
+        .order_by("pk")
+        .values("id", "quantity", "is_available")
+    )
+
+
+def _reindex(product_ids):
+    for product in Product.objects.filter(pk__in=product_ids).only(
+        "id", "name", "trending", "is_available"
+    ):
+        typeahead.index_product(Product, product)
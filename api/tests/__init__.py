@@ -0,0 +1,10 @@
+from django.test import override_settings
+
+
+# Tests run against per-process stores, so they need no Redis server.
+local_stores = override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage",
+    CART_STORE="api.carts.LocalCartStore",
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
@@ -0,0 +1,137 @@
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from api.admin import CURSOR_VAR
+from api.models import Category, Order, OrderItem, Product, User, Vendor
+
+from . import local_stores
+
+
+@local_stores
+class ChangeListQueryTests(TestCase):
+    """Changelists take the same number of queries however many rows there are."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin@example.com", "pw")
+        vendor_user = User.objects.create_user("vendor@example.com", "pw", is_vendor=True)
+        cls.vendor = Vendor.objects.create(user=vendor_user, name="Vendor")
+        cls.category = Category.objects.create(name="Shirts")
+        cls.customer = User.objects.create_user("customer@example.com", "pw")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def create_rows(self, count):
+        products = Product.objects.bulk_create(
+            Product(
+                name=f"Shirt {i}",
+                category=self.category,
+                vendor=self.vendor,
+                description="d",
+                price=1000 + i,
+                display_image=f"shirt{i}",
+            )
+            for i in range(count)
+        )
+        items = OrderItem.objects.bulk_create(
+            OrderItem(user=self.customer, product=product) for product in products
+        )
+        Order.objects.bulk_create(
+            Order(user=self.customer, completed=True, item_count=1, total_amount=item.product.price)
+            for item in items
+        )
+
+    # session, user, count and page; Postgres first reads the row estimate
+    first_page_queries = 5 if connection.vendor == "postgresql" else 4
+
+    def assertChangeListQueries(self, model, num, **params):
+        url = reverse(f"admin:api_{model._meta.model_name}_changelist")
+        with self.assertNumQueries(num):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_query_counts_do_not_grow_with_rows(self):
+        for count in (5, 120):
+            self.create_rows(count - Product.objects.count())
+            with self.subTest(rows=count):
+                self.assertChangeListQueries(Product, self.first_page_queries)
+                self.assertChangeListQueries(OrderItem, self.first_page_queries)
+                self.assertChangeListQueries(Order, self.first_page_queries)
+
+    def test_next_link_pages_by_cursor(self):
+        self.create_rows(120)
+        response = self.assertChangeListQueries(Product, self.first_page_queries)
+        page = list(response.context["cl"].result_list)
+        self.assertEqual(len(page), 50)
+        self.assertContains(response, f"?{CURSOR_VAR}={page[-1].pk}")
+
+        # Cursor pages skip the count: session, user and page.
+        response = self.assertChangeListQueries(Product, 3, **{CURSOR_VAR: page[-1].pk})
+        next_page = list(response.context["cl"].result_list)
+        self.assertEqual(next_page[0].pk, page[-1].pk - 1)
+        self.assertEqual(len(next_page), 50)
+        self.assertContains(response, f"?{CURSOR_VAR}={next_page[-1].pk}")
+
+    @skipUnless(connection.vendor == "postgresql", "row estimates are read from pg_class")
+    def test_large_tables_use_the_row_estimate(self):
+        self.create_rows(60)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE api_product")
+        with mock.patch("api.admin.ESTIMATED_COUNT_THRESHOLD", 10):
+            # session, user, estimate and page
+            response = self.assertChangeListQueries(Product, 4)
+        self.assertEqual(response.context["cl"].result_count, 60)
+
+    def test_last_cursor_page_has_no_next_link(self):
+        self.create_rows(60)
+        first = Product.objects.order_by("-pk").values_list("pk", flat=True)[49]
+        response = self.assertChangeListQueries(Product, 3, **{CURSOR_VAR: first})
+        self.assertEqual(len(response.context["cl"].result_list), 10)
+        self.assertIsNone(response.context["cl"].next_cursor_url)
+        self.assertNotContains(response, 'class="showall">Next')
+
+    def test_invalid_cursor(self):
+        url = reverse("admin:api_order_changelist")
+        response = self.client.get(url, {CURSOR_VAR: "not-a-uuid"})
+        self.assertEqual(response.status_code, 302)
+
+
+@local_stores
+class OrderAdminTests(TestCase):
+
+    def test_editing_items_recomputes_totals(self):
+        admin = User.objects.create_superuser("admin@example.com", "pw")
+        customer = User.objects.create_user("customer@example.com", "pw")
+        vendor = Vendor.objects.create(user=admin, name="Vendor")
+        category = Category.objects.create(name="Shirts")
+        items = [
+            OrderItem.objects.create(
+                user=customer,
+                quantity=quantity,
+                product=Product.objects.create(
+                    name=f"Shirt {price}",
+                    category=category,
+                    vendor=vendor,
+                    description="d",
+                    price=price,
+                    display_image="shirt",
+                ),
+            )
+            for price, quantity in ((1000, 2), (250, 1))
+        ]
+        order = Order.objects.create(user=customer, item_count=2, total_amount=2000)
+        order.items.add(items[0])
+
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse("admin:api_order_change", args=[order.pk]),
+            {"user": customer.pk, "items": ",".join(str(item.pk) for item in items)},
+        )
+        self.assertEqual(response.status_code, 302)
+        order.refresh_from_db()
+        self.assertEqual((order.item_count, order.total_amount), (3, 2250))
@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api import analytics, carts
+from api.archive import archive_batch
+from api.models import (
+    Category,
+    Order,
+    Product,
+    ProductDailySales,
+    User,
+    Vendor,
+    VendorDailySales,
+)
+
+from . import local_stores
+
+
+@local_stores
+class SalesRollupTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        carts._store = (None, None)
+        self.product = Product.objects.create(
+            name="Shirt",
+            category=Category.objects.create(name="Shirts"),
+            vendor=Vendor.objects.create(
+                user=User.objects.create_user("vendor@example.com", "pw", is_vendor=True),
+                name="Vendor",
+            ),
+            description="d",
+            price=1000,
+            display_image="shirt",
+            quantity=10,
+        )
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("buyer@example.com", "pw"))
+        client.post("/api/cart/", {"product": self.product.pk, "quantity": 3}, format="json")
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post("/api/orders/", {}, format="json")
+
+        self.order = Order.objects.get()
+        self.order.completed = True
+        self.order.save()
+        Product.objects.filter(pk=self.product.pk).update(price=1500)
+
+    def revenue(self):
+        return (
+            ProductDailySales.objects.get().revenue,
+            VendorDailySales.objects.get().revenue,
+        )
+
+    def test_rebuild_keeps_the_prices_paid(self):
+        self.assertEqual(self.revenue(), (3000, 3000))
+        analytics.rebuild_sales()
+        self.assertEqual(self.revenue(), (3000, 3000))
+
+    def test_archived_lines_keep_the_prices_paid(self):
+        archive_batch(self.order.datetime_created.replace(year=3000), 10)
+        analytics.rebuild_sales()
+        self.assertEqual(self.revenue(), (3000, 3000))
@@ -0,0 +1,131 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.archive import archive_batch, get_cutoff
+from api.models import (
+    ArchivedOrder,
+    ArchivedOrderItem,
+    Category,
+    Order,
+    OrderItem,
+    Product,
+    User,
+    Vendor,
+)
+
+from . import local_stores
+
+
+@local_stores
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser("admin@example.com", "pw")
+        self.product = Product.objects.create(
+            name="Shirt",
+            category=Category.objects.create(name="Shirts"),
+            vendor=Vendor.objects.create(
+                user=User.objects.create_user("vendor@example.com", "pw", is_vendor=True),
+                name="Vendor",
+            ),
+            description="d",
+            price=100,
+            display_image="shirt",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_order(self, total, created, items=None):
+        order = Order.objects.create(
+            user=self.user, completed=True, total_amount=total, item_count=1
+        )
+        if items is None:
+            items = [
+                OrderItem.objects.create(
+                    user=self.user, product=self.product, quantity=1, price=total
+                )
+            ]
+        order.items.add(*items)
+        Order.objects.filter(pk=order.pk).update(datetime_created=created)
+        return order
+
+    def create_orders(self):
+        now, old = timezone.now(), get_cutoff() - timedelta(days=30)
+        hot = [self.create_order(t, now - timedelta(hours=t)) for t in (100, 300, 500)]
+        archived = [self.create_order(t, old - timedelta(hours=t)) for t in (200, 400, 600)]
+        self.assertEqual(archive_batch(get_cutoff(), 10), 3)
+        return hot, archived
+
+    def page(self, offset, ordering):
+        return self.client.get("/api/orders/", {
+            "created_after": "2000-01-01",
+            "ordering": ordering,
+            "limit": 2,
+            "offset": offset,
+        }).data
+
+    def test_pages_run_across_the_archive_by_total(self):
+        self.create_orders()
+        pages = [self.page(offset, "-total") for offset in (0, 2, 4)]
+        self.assertEqual([page["count"] for page in pages], [6, 6, 6])
+        self.assertEqual(
+            [order["total_amount"] for page in pages for order in page["results"]],
+            [600, 500, 400, 300, 200, 100],
+        )
+
+    def test_pages_run_across_the_archive_by_date(self):
+        hot, archived = self.create_orders()
+        pages = [self.page(offset, "-datetime_created") for offset in (0, 2, 4)]
+        self.assertEqual(
+            [order["id"] for page in pages for order in page["results"]],
+            [str(order.pk) for order in hot + archived],
+        )
+
+    def test_archived_orders_are_retrieved(self):
+        _, archived = self.create_orders()
+        response = self.client.get(f"/api/orders/{archived[0].pk}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_amount"], 200)
+        self.assertEqual(response.data["items"][0]["price"], 200)
+
+    def test_lines_shared_by_orders_outlive_the_first_archive(self):
+        old = get_cutoff() - timedelta(days=30)
+        first = self.create_order(100, old - timedelta(days=1))
+        item = first.items.get()
+        self.create_order(100, old, items=[item])
+
+        self.assertEqual(archive_batch(get_cutoff(), 1), 1)
+        self.assertTrue(OrderItem.objects.filter(pk=item.pk).exists())
+        self.assertEqual(archive_batch(get_cutoff(), 1), 1)
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertEqual(ArchivedOrderItem.objects.get().pk, item.pk)
+        self.assertEqual(ArchivedOrder.items.through.objects.count(), 2)
+
+    def test_archiving_an_order_twice_keeps_one_copy(self):
+        created = get_cutoff() - timedelta(days=30)
+        order = self.create_order(100, created)
+        item = order.items.get()
+        self.assertEqual(archive_batch(get_cutoff(), 10), 1)
+        self.assertEqual(archive_batch(get_cutoff(), 10), 0)
+
+        # The same order restored into the hot table, e.g. from a backup.
+        restored = Order.objects.create(
+            id=order.pk, user=self.user, completed=True, total_amount=100, item_count=1
+        )
+        restored.items.add(
+            OrderItem.objects.create(
+                id=item.pk, user=self.user, product=self.product, quantity=1, price=100
+            )
+        )
+        Order.objects.filter(pk=order.pk).update(datetime_created=created)
+
+        self.assertEqual(archive_batch(get_cutoff(), 10), 1)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertEqual(ArchivedOrder.objects.get().pk, order.pk)
+        self.assertEqual(ArchivedOrder.items.through.objects.count(), 1)
@@ -0,0 +1,90 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from api import cache as api_cache
+from api.models import Category, Product, User, Vendor
+
+from . import local_stores
+
+
+@local_stores
+class ListVersionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(
+            name="Shirt",
+            category=Category.objects.create(name="Shirts"),
+            vendor=Vendor.objects.create(
+                user=User.objects.create_user("vendor@example.com", "pw", is_vendor=True),
+                name="Vendor",
+            ),
+            description="d",
+            price=1000,
+            display_image="shirt",
+        )
+
+    def test_product_writes_bump_the_list_version(self):
+        version = api_cache.get_list_versions(["product"])
+        self.assertEqual(api_cache.get_list_versions(["product"]), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertNotEqual(api_cache.get_list_versions(["product"]), version)
+
+    def test_cached_lists_show_the_write(self):
+        self.assertEqual(self.client.get("/api/products/").json()["results"][0]["name"], "Shirt")
+
+        self.product.name = "Red shirt"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertEqual(
+            self.client.get("/api/products/").json()["results"][0]["name"], "Red shirt"
+        )
+
+
+@local_stores
+class SingleFlightTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_misses_compute_once(self):
+        calls, started, release = [], threading.Event(), threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "value"
+
+        results = []
+
+        def read():
+            results.append(api_cache.single_flight("flight:test", compute, 60))
+
+        threads = [threading.Thread(target=read) for _ in range(5)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, ["value"] * 5)
+        self.assertEqual(cache.get("flight:test"), "value")
+
+    def test_misses_wait_for_another_process_holding_the_lock(self):
+        cache.add("flight:test:lock", 1)
+        timer = threading.Timer(0.1, cache.set, ("flight:test", "theirs", 60))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        value = api_cache.single_flight("flight:test", lambda: "ours", 60)
+        self.assertEqual(value, "theirs")
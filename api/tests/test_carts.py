@@ -0,0 +1,99 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import carts
+from api.models import Category, Order, OrderItem, Product, User, Vendor
+
+from . import local_stores
+
+
+@local_stores
+class CartTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        carts._store = (None, None)
+        vendor = Vendor.objects.create(
+            user=User.objects.create_user("vendor@example.com", "pw", is_vendor=True),
+            name="Vendor",
+        )
+        self.product = Product.objects.create(
+            name="Shirt",
+            category=Category.objects.create(name="Shirts"),
+            vendor=vendor,
+            description="d",
+            price=1000,
+            display_image="shirt",
+            quantity=5,
+        )
+        self.user = User.objects.create_user("buyer@example.com", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add(self, quantity):
+        return self.client.post(
+            "/api/cart/",
+            {"product": self.product.pk, "quantity": quantity},
+            format="json",
+        )
+
+    def test_adding_a_product_again_increments_its_line(self):
+        self.assertEqual(self.add(2).data["quantity"], 2)
+        self.assertEqual(self.add(3).data["quantity"], 5)
+        self.assertEqual(carts.get_cart_store().lines(self.user), {self.product.pk: 5})
+
+    def test_adding_more_than_the_stock_leaves_the_line_unchanged(self):
+        self.add(4)
+        response = self.add(2)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["quantity"], ["Product has only 5 units available."])
+        self.assertEqual(carts.get_cart_store().get(self.user, self.product.pk), 4)
+
+    def test_checkout_takes_the_units_out_of_stock(self):
+        self.add(3)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/orders/", {}, format="json")
+        self.assertEqual(response.status_code, 201)
+
+        order = Order.objects.get()
+        self.assertEqual((order.item_count, order.total_amount), (3, 3000))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 2)
+        self.assertEqual(carts.get_cart_store().lines(self.user), {})
+
+    def test_checkout_is_refused_once_the_stock_is_gone(self):
+        self.add(3)
+        Product.objects.filter(pk=self.product.pk).update(quantity=2)
+        response = self.client.post("/api/orders/", {}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(carts.get_cart_store().get(self.user, self.product.pk), 3)
+
+    @override_settings(CART_STORE="api.carts.RedisCartStore")
+    def test_redis_store_falls_back_to_the_database_without_redis(self):
+        with self.assertLogs("api.carts", "WARNING"):
+            self.assertIsInstance(carts.get_cart_store(), carts.DatabaseCartStore)
+
+
+@override_settings(CART_STORE=None)
+class DatabaseCartTests(CartTests):
+    """The same cases with the cart kept as open `OrderItem` rows."""
+
+    def test_order_items_keep_their_own_ids(self):
+        item = self.client.post(
+            "/api/order-items/", {"product": self.product.pk, "quantity": 2}, format="json"
+        ).data
+        self.assertEqual(OrderItem.objects.get().pk, item["id"])
+        self.assertEqual(self.add(1).data["quantity"], 3)
+        self.assertEqual(OrderItem.objects.get().quantity, 3)
+
+    def test_ordered_lines_are_not_ordered_again(self):
+        self.add(2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post("/api/orders/", {}, format="json").status_code, 201)
+        response = self.client.post("/api/orders/", {}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 3)
@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from api import cdn
+from api.models import Category, Image, Product, User, Vendor
+
+from . import local_stores
+
+
+@local_stores
+class PurgeTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Shirts")
+        self.product = Product.objects.create(
+            name="Shirt",
+            category=self.category,
+            vendor=Vendor.objects.create(
+                user=User.objects.create_user("vendor@example.com", "pw", is_vendor=True),
+                name="Vendor",
+            ),
+            description="d",
+            price=1000,
+            display_image="shirt",
+        )
+
+    def purged(self, write):
+        purger = cdn.get_purger()
+        purger.purged.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        return sorted({key for keys in purger.purged for key in keys})
+
+    def test_product_writes_purge_the_product(self):
+        keys = ["product", f"product:{self.product.pk}"]
+        self.product.name = "Red shirt"
+        self.assertEqual(self.purged(self.product.save), keys)
+        self.assertEqual(self.purged(self.product.delete), keys)
+
+    def test_nothing_is_purged_before_the_commit(self):
+        purger = cdn.get_purger()
+        purger.purged.clear()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.product.save()
+        self.assertEqual(list(purger.purged), [])
+        self.assertTrue(callbacks)
+
+    def test_writes_purge_the_responses_they_appear_in(self):
+        image = Image.objects.create(product=self.product, url="back")
+        response = self.client.get(f"/api/products/{self.product.pk}/")
+        tags = response["Surrogate-Key"].split()
+
+        for instance, key in (
+            (self.category, f"category:{self.category.pk}"),
+            (self.product.vendor, f"vendor:{self.product.vendor_id}"),
+            (image, f"image:{image.pk}"),
+        ):
+            self.assertIn(key, tags)
+            self.assertIn(key, self.purged(instance.save))
+
+    def test_buying_a_product_purges_it(self):
+        buyer = User.objects.create_user("buyer@example.com", "pw")
+        self.assertEqual(
+            self.purged(lambda: buyer.users.add(self.product)), [f"product:{self.product.pk}"]
+        )
+        self.assertEqual(
+            self.purged(lambda: buyer.users.clear()), [f"product:{self.product.pk}"]
+        )
@@ -0,0 +1,124 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import hotcache
+from api.models import Category, Product, User, Vendor
+from api.serializers import ProductSerializer
+
+from . import local_stores
+
+
+@local_stores
+class HotObjectsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for hot in hotcache.HOT_OBJECTS.values():
+            hot.clear()
+        self.user = User.objects.create_user("vendor@example.com", "pw", is_vendor=True)
+        self.vendor = Vendor.objects.create(user=self.user, name="Vendor")
+        self.category = Category.objects.create(name="Shirts")
+        self.product = Product.objects.create(
+            name="Shirt",
+            category=self.category,
+            vendor=self.vendor,
+            description="d",
+            price=1000,
+            display_image="shirt",
+        )
+
+    def create_product(self, **data):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.post(
+            "/api/products/",
+            {
+                "name": "Hat",
+                "category": self.category.pk,
+                "vendor": self.vendor.pk,
+                "description": "d",
+                "price": 500,
+                "display_image": "hat",
+                **data,
+            },
+            format="json",
+        )
+
+    def test_vendors_load_in_one_query(self):
+        for i in range(20):
+            user = User.objects.create_user(f"vendor{i}@example.com", "pw", is_vendor=True)
+            Vendor.objects.create(user=user, name=f"Vendor {i}")
+        hot = hotcache.HOT_OBJECTS[Vendor]
+        hot.clear()
+        with self.assertNumQueries(1):
+            objects, data = hot.load()
+        self.assertEqual(len(objects), 21)
+        self.assertEqual(data[self.vendor.pk]["user"], self.user.pk)
+
+    def test_representation_does_not_fetch_category_or_vendor(self):
+        hotcache.HOT_OBJECTS[Category].load()
+        hotcache.HOT_OBJECTS[Vendor].load()
+        product = Product.objects.get(pk=self.product.pk)
+        with self.assertNumQueries(3):  # images, sizes, customers
+            data = ProductSerializer(product).data
+        self.assertEqual(data["category"], {"id": self.category.pk, "name": "Shirts", "parent": None})
+        self.assertEqual(data["vendor"]["name"], "Vendor")
+
+    def test_save_invalidates_on_commit(self):
+        hot = hotcache.HOT_OBJECTS[Category]
+        self.assertEqual(hot.load()[1][self.category.pk]["name"], "Shirts")
+        version = cache.get(hot.key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = "Tops"
+            self.category.save()
+        self.assertNotEqual(cache.get(hot.key), version)
+        self.assertEqual(hot.load()[1][self.category.pk]["name"], "Tops")
+
+    @override_settings(HOT_CACHE_CHECK_INTERVAL=0)
+    def test_reloads_when_another_process_bumps_the_version(self):
+        hot = hotcache.HOT_OBJECTS[Category]
+        hot.load()
+        # Another process renames the category and bumps the version.
+        Category.objects.filter(pk=self.category.pk).update(name="Tops")
+        self.assertEqual(hot.load()[1][self.category.pk]["name"], "Shirts")
+        cache.set(hot.key, "other", timeout=None)
+        self.assertEqual(hot.load()[1][self.category.pk]["name"], "Tops")
+
+    @override_settings(HOT_CACHE_CHECK_INTERVAL=0)
+    def test_reloads_when_the_version_is_lost(self):
+        hot = hotcache.HOT_OBJECTS[Category]
+        hot.load()
+        Category.objects.filter(pk=self.category.pk).update(name="Tops")
+        cache.clear()
+        self.assertEqual(hot.load()[1][self.category.pk]["name"], "Tops")
+
+    def test_write_resolves_held_rows(self):
+        hotcache.HOT_OBJECTS[Vendor].load()
+        response = self.create_product()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["vendor"]["id"], self.vendor.pk)
+
+    def test_write_checks_held_rows_without_queries(self):
+        hotcache.HOT_OBJECTS[Vendor].load()
+        field = ProductSerializer().fields["vendor"]
+        with self.assertNumQueries(0):
+            self.assertEqual(field.to_internal_value(self.vendor.pk).pk, self.vendor.pk)
+
+    def test_write_rejects_row_deleted_by_another_process(self):
+        hot = hotcache.HOT_OBJECTS[Vendor]
+        hot.load()
+        # Another process deletes the vendor and bumps the version, which this
+        # process would only read at its next check.
+        Product.objects.all().delete()
+        Vendor.objects.filter(pk=self.vendor.pk)._raw_delete(Vendor.objects.db)
+        cache.set(hot.key, "other", timeout=None)
+        self.assertIn(self.vendor.pk, hot.load()[0])
+        response = self.create_product()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("vendor", response.data)
+
+    def test_write_rejects_unknown_pk(self):
+        response = self.create_product(category=999)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("category", response.data)
@@ -0,0 +1,68 @@
+import hashlib
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api import carts, idempotency
+from api.models import Category, Product, User, Vendor
+
+from . import local_stores
+
+
+@local_stores
+class IdempotencyTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        carts._store = (None, None)
+        self.product = Product.objects.create(
+            name="Shirt",
+            category=Category.objects.create(name="Shirts"),
+            vendor=Vendor.objects.create(
+                user=User.objects.create_user("vendor@example.com", "pw", is_vendor=True),
+                name="Vendor",
+            ),
+            description="d",
+            price=1000,
+            display_image="shirt",
+            quantity=10,
+        )
+        self.user = User.objects.create_user("buyer@example.com", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add(self, key):
+        return self.client.post(
+            "/api/cart/",
+            {"product": self.product.pk, "quantity": 2},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def lock_key(self, key):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return f"idempotency:cart:{self.user.pk}:{digest}:lock"
+
+    def test_retries_are_replayed(self):
+        first, retry = self.add("abc"), self.add("abc")
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(carts.get_cart_store().get(self.user, self.product.pk), 2)
+        self.assertIsNone(cache.get(self.lock_key("abc")))
+
+    def test_requests_in_progress_conflict(self):
+        token = idempotency.acquire_lock(self.lock_key("abc"), 30)
+        self.assertEqual(self.add("abc").status_code, 409)
+        self.assertEqual(cache.get(self.lock_key("abc")), token)
+
+    def test_expired_lock_does_not_release_its_successor(self):
+        stale = idempotency.acquire_lock("lock", 30)
+        cache.delete("lock")  # expired
+        current = idempotency.acquire_lock("lock", 30)
+
+        idempotency.release_lock("lock", stale)
+        self.assertEqual(cache.get("lock"), current)
+        idempotency.release_lock("lock", current)
+        self.assertIsNone(cache.get("lock"))
@@ -0,0 +1,92 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock, skipIf
+
+from cloudinary import CloudinaryResource
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from api import images
+from api.models import Category, Product, User, Vendor
+
+from . import local_stores
+
+try:
+    from PIL import Image as PILImage
+except ImportError:
+    PILImage = None
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@skipIf(PILImage is None, "PillowBackend requires Pillow")
+@local_stores
+@override_settings(
+    IMAGE_VARIANT_BACKEND="api.images.PillowBackend", MEDIA_ROOT=MEDIA_ROOT, MEDIA_URL="/media/"
+)
+class SrcsetTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.addClassCleanup(shutil.rmtree, MEDIA_ROOT, ignore_errors=True)
+        for name in ("shirt", "hat"):
+            PILImage.new("RGB", (800, 600)).save(Path(MEDIA_ROOT) / f"{name}.jpg")
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(
+            name="Shirt",
+            category=Category.objects.create(name="Shirts"),
+            vendor=Vendor.objects.create(
+                user=User.objects.create_user("vendor@example.com", "pw", is_vendor=True),
+                name="Vendor",
+            ),
+            description="d",
+            price=1000,
+            display_image="shirt",
+        )
+
+    def variants(self, name):
+        return {size: f"/media/variants/{size}/{name}.jpg" for size in settings.IMAGE_VARIANTS}
+
+    def test_variants_are_built_on_create(self):
+        self.assertEqual(self.product.srcset, self.variants("shirt"))
+        with PILImage.open(Path(MEDIA_ROOT) / "variants" / "thumbnail" / "shirt.jpg") as image:
+            self.assertEqual(image.size, (150, 150))
+        with PILImage.open(Path(MEDIA_ROOT) / "variants" / "zoom" / "shirt.jpg") as image:
+            self.assertEqual(image.size, (800, 600))
+
+    def test_saves_that_keep_the_image_keep_its_variants(self):
+        with mock.patch.object(images.PillowBackend, "build") as build:
+            self.product.name = "Red shirt"
+            self.product.save()
+            Product.objects.get(pk=self.product.pk).save()
+        build.assert_not_called()
+        self.assertEqual(self.product.srcset, self.variants("shirt"))
+
+    def test_changing_the_image_rebuilds_its_variants(self):
+        self.product.display_image = "hat"
+        self.product.save()
+        self.assertEqual(self.product.srcset, self.variants("hat"))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.srcset, self.variants("hat"))
+
+    def test_missing_originals_leave_no_variants(self):
+        self.product.display_image = "scarf"
+        with self.assertLogs("api.images", "WARNING"):
+            self.product.save()
+        self.assertEqual(self.product.srcset, {})
+
+
+class CloudinaryBackendTests(TestCase):
+
+    def test_unconfigured_cloudinary_leaves_no_variants(self):
+        resource = images.get_resource(Product, "hat")
+        with mock.patch.object(
+            CloudinaryResource, "build_url", side_effect=ValueError("Must supply cloud_name")
+        ), self.assertLogs("api.images", "WARNING"):
+            self.assertEqual(images.CloudinaryBackend().build(resource), {})
@@ -0,0 +1,78 @@
+from unittest import mock
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from api import listing
+from api.models import Category, Image, Product, ProductListing, User, Vendor
+from api.serializers import ProductSerializer
+from api.views import ProductViewSet
+
+from . import local_stores
+
+
+@local_stores
+class ProductListTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user("vendor@example.com", "pw", is_vendor=True)
+        vendor = Vendor.objects.create(user=user, name="Vendor")
+        category = Category.objects.create(name="Shirts")
+        for name in ("Shirt", "Shoe   é"):
+            product = Product.objects.create(
+                name=name,
+                category=category,
+                vendor=vendor,
+                description="d",
+                price=1000,
+                display_image="image",
+            )
+        Image.objects.create(product=product, url="image")
+
+    def expected(self):
+        return JSONRenderer().render({
+            "count": 2,
+            "next": None,
+            "previous": None,
+            "results": ProductSerializer(Product.objects.order_by("name"), many=True).data,
+        })
+
+    def test_list_renders_like_the_serializer(self):
+        response = self.client.get("/api/products/", {"ordering": "name"})
+        self.assertEqual(response.content, self.expected())
+
+    def test_other_renderers_get_decoded_rows(self):
+        with mock.patch.object(ProductViewSet, "renderer_classes", [JSONRenderer]):
+            response = self.client.get("/api/products/", {"ordering": "name"})
+        self.assertEqual(response.content, self.expected())
+
+    def test_migrating_the_table_fills_it(self):
+        ProductListing.objects.all().delete()
+        migration = MigrationLoader(connection).get_migration("api", "0015_product_listing")
+        listing.backfill_listings(apps.get_app_config("api"), plan=[(migration, False)])
+        self.assertEqual(ProductListing.objects.count(), 2)
+
+    def test_list_is_tagged_with_every_row(self):
+        response = self.client.get("/api/products/")
+        image, product = Image.objects.get(), Product.objects.order_by("pk").first()
+        self.assertEqual(
+            response["Surrogate-Key"].split(),
+            sorted([
+                f"category:{product.category_id}",
+                f"image:{image.pk}",
+                "product",
+                f"product:{product.pk}",
+                f"product:{image.product_id}",
+                f"vendor:{product.vendor_id}",
+            ]),
+        )
+
+    def test_indented_output_decodes_rows(self):
+        response = self.client.get("/api/products/", HTTP_ACCEPT="application/json; indent=2")
+        self.assertEqual(response.json()["count"], 2)
+        self.assertTrue(response.content.startswith(b'{\n  "count": 2'))
@@ -0,0 +1,90 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api import outbox
+from api.models import Category, OutboxEvent
+
+from . import local_stores
+
+
+def create_category(payload):
+    Category.objects.create(name=payload["name"])
+    if payload.get("fail", False):
+        raise RuntimeError("handler failed")
+
+
+@local_stores
+class DispatchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.dict(outbox._handlers, {"test": [create_category]})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_due(self):
+        OutboxEvent.objects.update(available_at=timezone.now())
+
+    def dispatch(self):
+        with self.assertLogs("api.outbox", "ERROR"):
+            return outbox.dispatch()
+
+    def test_failed_events_back_off_exponentially(self):
+        event = outbox.publish("test", {"name": "Hats", "fail": True})
+        for attempts, delay in ((1, 10), (2, 20), (3, 40)):
+            before = timezone.now()
+            self.assertEqual(self.dispatch(), 1)
+            self.assertEqual(outbox.dispatch(), 0)
+
+            event.refresh_from_db()
+            self.assertEqual((event.status, event.attempts), (OutboxEvent.PENDING, attempts))
+            self.assertIn("handler failed", event.last_error)
+            self.assertGreaterEqual(event.available_at, before + timedelta(seconds=delay))
+            self.assertLess(event.available_at, timezone.now() + timedelta(seconds=delay))
+            self.make_due()
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_events_fail_for_good_at_the_last_attempt(self):
+        event = outbox.publish("test", {"name": "Hats", "fail": True})
+        self.dispatch()
+        self.make_due()
+        self.dispatch()
+        self.make_due()
+
+        self.assertEqual(outbox.dispatch(), 0)
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), (OutboxEvent.FAILED, 2))
+
+    def test_a_failing_handler_leaves_the_rest_of_the_batch(self):
+        events = [
+            outbox.publish("test", {"name": "Shirts"}),
+            outbox.publish("test", {"name": "Hats", "fail": True}),
+            outbox.publish("test", {"name": "Shoes"}),
+        ]
+        self.assertEqual(self.dispatch(), 3)
+
+        self.assertEqual(
+            sorted(Category.objects.values_list("name", flat=True)), ["Shirts", "Shoes"]
+        )
+        for event in events:
+            event.refresh_from_db()
+        self.assertEqual(
+            [event.status for event in events],
+            [OutboxEvent.DONE, OutboxEvent.PENDING, OutboxEvent.DONE],
+        )
+
+    def test_handlers_run_after_the_claim(self):
+        claimed = []
+
+        def claim_again(payload):
+            claimed.extend(outbox.claim(10))
+
+        outbox.publish("other", {})
+        with mock.patch.dict(outbox._handlers, {"other": [claim_again]}):
+            self.assertEqual(outbox.dispatch(), 1)
+        self.assertEqual(claimed, [])
+        self.assertEqual(OutboxEvent.objects.get().status, OutboxEvent.DONE)
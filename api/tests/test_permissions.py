@@ -0,0 +1,41 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.models import Category, Product, User, Vendor
+
+from . import local_stores
+
+
+@local_stores
+class VendorIdsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user("owner@example.com", "pw", is_vendor=True)
+        self.buyer = User.objects.create_user("buyer@example.com", "pw", is_vendor=True)
+        self.vendor = Vendor.objects.create(user=self.owner, name="Vendor")
+        self.product = Product.objects.create(
+            name="Shirt",
+            category=Category.objects.create(name="Shirts"),
+            vendor=self.vendor,
+            description="d",
+            price=1000,
+            display_image="shirt",
+        )
+
+    def rename(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.patch(f"/api/products/{self.product.pk}/", {"name": "Hat"}, format="json")
+
+    def test_reassigned_vendor_clears_both_users(self):
+        # Cache both users' vendor ids.
+        self.assertEqual(self.rename(self.owner).status_code, 200)
+        self.assertEqual(self.rename(self.buyer).status_code, 403)
+
+        self.vendor.user = self.buyer
+        self.vendor.save()
+
+        self.assertEqual(self.rename(self.owner).status_code, 403)
+        self.assertEqual(self.rename(self.buyer).status_code, 200)
@@ -0,0 +1,56 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import provisioning
+from api.models import User
+
+from . import local_stores
+
+
+@local_stores
+class ProvisionUsersTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_endpoint_hashes_in_process(self):
+        admin = User.objects.create_superuser("admin@example.com", "pw")
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        with mock.patch.object(provisioning, "ProcessPoolExecutor") as pool:
+            response = client.post(
+                "/api/users/import/",
+                [{"email": "a@example.com", "password": "secret-pw-1"}],
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["created"], 1)
+        pool.assert_not_called()
+        self.assertTrue(User.objects.get(email="a@example.com").check_password("secret-pw-1"))
+
+    def test_email_registered_during_the_import_is_skipped(self):
+        real_filter = User.objects.filter
+
+        def register_after_check(*args, **kwargs):
+            # The existence check misses an email registered just after it.
+            User.objects.filter = real_filter
+            User.objects.create_user("taken@example.com", "pw")
+            return real_filter(pk__in=[])
+
+        with mock.patch.object(User.objects, "filter", register_after_check):
+            report = provisioning.provision_users(
+                [
+                    {"email": "taken@example.com", "password": "secret-pw-1"},
+                    {"email": "new@example.com", "password": "secret-pw-2"},
+                ],
+                workers=1,
+            )
+
+        self.assertEqual(report, {"created": 1, "skipped": ["taken@example.com"], "errors": []})
+        new = User.objects.get(email="new@example.com")
+        self.assertTrue(Token.objects.filter(user=new).exists())
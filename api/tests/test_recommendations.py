@@ -0,0 +1,82 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from api import recommendations
+from api.models import (
+    Category, Order, OrderItem, Product, ProductPairCount, RelatedProduct, User, Vendor,
+)
+
+from . import local_stores
+
+
+@local_stores
+class RecommendationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("buyer@example.com", "pw")
+        vendor = Vendor.objects.create(
+            user=User.objects.create_user("vendor@example.com", "pw", is_vendor=True),
+            name="Vendor",
+        )
+        category = Category.objects.create(name="Shirts")
+        self.shirt, self.hat, self.scarf = (
+            Product.objects.create(
+                name=name,
+                category=category,
+                vendor=vendor,
+                description="d",
+                price=1000,
+                display_image=name,
+            )
+            for name in ("shirt", "hat", "scarf")
+        )
+
+    def order(self, products, completed):
+        order = Order.objects.create(user=self.user, completed=True, datetime_completed=completed)
+        order.items.add(*(
+            OrderItem.objects.create(user=self.user, product=product) for product in products
+        ))
+        return order
+
+    def pair_counts(self):
+        return {
+            (product, other): count
+            for product, other, count in ProductPairCount.objects.values_list(
+                "product", "other", "count"
+            )
+        }
+
+    def test_full_build_counts_every_order_in_batches(self):
+        hour_ago = timezone.now() - timedelta(hours=1)
+        self.order([self.shirt, self.hat], hour_ago)
+        self.order([self.shirt, self.hat, self.scarf], hour_ago)
+        self.order([self.shirt, self.scarf], hour_ago)
+
+        self.assertEqual(recommendations.build(full=True, batch_size=1), 3)
+        counts = self.pair_counts()
+        self.assertEqual(counts[(self.shirt.pk, self.shirt.pk)], 3)
+        self.assertEqual(counts[(self.shirt.pk, self.hat.pk)], 2)
+        self.assertEqual(counts[(self.hat.pk, self.scarf.pk)], 1)
+        self.assertEqual(
+            list(RelatedProduct.objects.filter(product=self.hat).order_by("rank").values_list(
+                "related", flat=True
+            )),
+            [self.shirt.pk, self.scarf.pk],
+        )
+
+    def test_orders_committed_after_a_run_are_counted_by_the_next(self):
+        now = timezone.now()
+        self.order([self.shirt, self.hat], now - timedelta(hours=1))
+        recommendations.build()
+
+        # Completed just before that run, but committed after it.
+        self.order([self.shirt, self.hat], now - timedelta(seconds=30))
+        with mock.patch("django.utils.timezone.now", return_value=now + timedelta(minutes=10)):
+            recommendations.build()
+            recommendations.build()
+        self.assertEqual(self.pair_counts()[(self.shirt.pk, self.hat.pk)], 2)
@@ -0,0 +1,28 @@
+import time
+
+from django.test import TransactionTestCase, override_settings
+
+from api import scheduler
+from api.models import ScheduledJob
+
+from . import local_stores
+
+
+@local_stores
+class SchedulerTests(TransactionTestCase):
+
+    @override_settings(SCHEDULER_LEASE=0.3)
+    def test_lease_is_renewed_while_the_job_runs(self):
+        seen = []
+
+        def slow(run):
+            time.sleep(0.5)
+            seen.append(scheduler.claim(job, "other-node", force=True))
+            return 1
+
+        job = scheduler.Job("slow", slow, interval=60)
+        self.assertTrue(scheduler.run_job(job, "this-node"))
+        self.assertEqual(seen, [False])
+
+        state = ScheduledJob.objects.get(name="slow")
+        self.assertEqual((state.lease_owner, state.last_result), ("", 1))
@@ -0,0 +1,88 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api import stock
+from api.models import Category, Product, User, Vendor
+
+from . import local_stores
+
+
+@local_stores
+class StockSyncTests(TestCase):
+    """Runs the raw UPDATE ... RETURNING on PostgreSQL and the ORM UPDATE elsewhere."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("vendor@example.com", "pw", is_vendor=True)
+        vendor = Vendor.objects.create(user=self.user, name="Vendor")
+        category = Category.objects.create(name="Shirts")
+        self.shirt, self.hat = (
+            Product.objects.create(
+                name=name,
+                category=category,
+                vendor=vendor,
+                description="d",
+                price=1000,
+                display_image=name,
+                quantity=quantity,
+                is_available=quantity > 0,
+            )
+            for name, quantity in (("shirt", 5), ("hat", 0))
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, changes):
+        return self.client.post("/api/products/stock/", changes, format="json")
+
+    def test_deltas_and_quantities_are_applied(self):
+        response = self.sync([
+            {"product": self.shirt.pk, "delta": -2},
+            {"product": self.hat.pk, "quantity": 7},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"], [
+            {"id": self.shirt.pk, "quantity": 3, "is_available": True},
+            {"id": self.hat.pk, "quantity": 7, "is_available": True},
+        ])
+        self.assertEqual(
+            list(Product.objects.order_by("pk").values_list("quantity", "is_available")),
+            [(3, True), (7, True)],
+        )
+
+    def test_deltas_beyond_the_stock_stop_at_zero(self):
+        response = self.sync([{"product": self.shirt.pk, "delta": -8}])
+        self.assertEqual(
+            response.data["results"], [{"id": self.shirt.pk, "quantity": 0, "is_available": False}]
+        )
+
+    def test_products_of_other_vendors_are_refused(self):
+        other = Vendor.objects.create(
+            user=User.objects.create_user("other@example.com", "pw", is_vendor=True),
+            name="Other",
+        )
+        Product.objects.filter(pk=self.hat.pk).update(vendor=other)
+
+        response = self.sync([
+            {"product": self.shirt.pk, "delta": -1},
+            {"product": self.hat.pk, "quantity": 3},
+        ])
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(
+            list(Product.objects.order_by("pk").values_list("quantity", flat=True)), [5, 0]
+        )
+
+
+class OrmStockSyncTests(StockSyncTests):
+    """The same cases through the ORM UPDATE, whatever the database."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(
+            stock, "_update_returning", lambda connection, changes: stock._update_case(changes)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
@@ -0,0 +1,113 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import throttling
+from api.models import User
+
+from . import local_stores
+
+
+def with_rates(**rates):
+    return override_settings(
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}
+    )
+
+
+@local_stores
+class ThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        throttling._buckets.clear()
+        self.user = User.objects.create_user("buyer@example.com", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @with_rates(checkout="1/min")
+    def test_checkout_rate_applies_to_placing_orders_only(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get("/api/orders/").status_code, 200)
+        self.assertEqual(self.client.post("/api/orders/", {}, format="json").status_code, 400)
+        self.assertEqual(self.client.post("/api/orders/", {}, format="json").status_code, 429)
+
+    @with_rates(search="1/min", suggest="3/min")
+    def test_suggestions_have_their_own_scope(self):
+        statuses = [self.client.get("/api/suggestions/?q=sh").status_code for _ in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+
+    @override_settings(THROTTLE_LOCAL_MAX_BUCKETS=3)
+    def test_local_buckets_are_bounded(self):
+        for i in range(10):
+            throttling.take_token(f"throttle:test:{i}", 5, 60)
+        self.assertEqual(list(throttling._buckets), [f"throttle:test:{i}" for i in (7, 8, 9)])
+
+    def test_refilled_local_buckets_are_dropped(self):
+        throttling.take_token("throttle:test:old", 5, 60)
+        refilled = throttling._buckets["throttle:test:old"][1] + 61
+        with mock.patch("time.monotonic", return_value=refilled):
+            throttling.take_token("throttle:test:new", 5, 60)
+        self.assertEqual(list(throttling._buckets), ["throttle:test:new"])
+
+
+@local_stores
+@with_rates()
+class LoadSheddingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user("buyer@example.com", "pw")
+        self.token, _ = Token.objects.get_or_create(user=user)
+        patcher = mock.patch.object(throttling.monitor, "overloaded", return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_anonymous_lists_are_shed(self):
+        response = self.client.get("/api/categories/")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], str(settings.LOAD_SHED_RETRY_AFTER))
+
+    def test_invalid_credentials_are_shed(self):
+        for header in ("Basic Zm9vOmJhcg==", "Token not-a-token"):
+            response = self.client.get("/api/categories/", HTTP_AUTHORIZATION=header)
+            self.assertEqual(response.status_code, 503)
+
+    def test_authenticated_lists_are_served(self):
+        response = self.client.get("/api/categories/", HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.assertEqual(response.status_code, 200)
+
+
+@local_stores
+@with_rates()
+class InFlightSheddingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        throttling.monitor.in_flight = 0
+        throttling.monitor.script = None
+        self.addCleanup(setattr, throttling.monitor, "script", None)
+
+    def test_requests_over_the_limit_are_shed(self):
+        with override_settings(LOAD_SHED_MAX_IN_FLIGHT=1):
+            self.assertEqual(self.client.get("/api/categories/").status_code, 200)
+            throttling.monitor.enter()
+            self.assertEqual(self.client.get("/api/categories/").status_code, 503)
+            throttling.monitor.leave()
+            self.assertEqual(self.client.get("/api/categories/").status_code, 200)
+        self.assertEqual(throttling.monitor.in_flight, 0)
+
+    def test_redis_counts_requests_across_processes(self):
+        client = mock.Mock()
+        client.pipeline.return_value.execute.return_value = [3, True]
+        with mock.patch.object(throttling, "get_redis_client", return_value=client):
+            self.assertEqual(throttling.monitor.enter(), 3)
+            throttling.monitor.leave()
+        client.pipeline.return_value.incr.assert_called_once_with(throttling.IN_FLIGHT_KEY)
+        client.register_script.return_value.assert_called_once_with(
+            keys=[throttling.IN_FLIGHT_KEY], client=client
+        )
+        self.assertEqual(throttling.monitor.in_flight, 0)
@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from api import popularity, typeahead
+from api.models import Category, Product, User, Vendor
+
+from . import local_stores
+
+
+@local_stores
+class SuggestionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        typeahead._local_index = typeahead.LocalIndex()
+        self.category = Category.objects.create(name="Shirts")
+        self.vendor = Vendor.objects.create(
+            user=User.objects.create_user("vendor@example.com", "pw", is_vendor=True),
+            name="Vendor",
+        )
+
+    def create_product(self, name, trending=0):
+        return Product.objects.create(
+            name=name,
+            category=self.category,
+            vendor=self.vendor,
+            description="d",
+            price=1000,
+            display_image="shirt",
+            trending=trending,
+        )
+
+    def test_products_rank_by_trending_across_every_match(self):
+        for i in range(30):
+            self.create_product(f"Shirt {i:02}")
+        popular = self.create_product("Shirt zz", trending=5)
+
+        products = typeahead.suggest("shi", 3)["products"]
+        self.assertEqual(products[0], {"id": popular.pk, "name": "Shirt zz"})
+        self.assertEqual(typeahead.suggest("sh", 5)["categories"][0]["name"], "Shirts")
+
+    def test_flushed_popularity_reorders_suggestions(self):
+        first = self.create_product("Red shirt", trending=1)
+        second = self.create_product("Blue shirt", trending=2)
+        self.assertEqual(
+            [p["id"] for p in typeahead.suggest("shirt", 2)["products"]], [second.pk, first.pk]
+        )
+
+        for _ in range(3):
+            popularity.record(first.pk, popularity.VIEWS)
+        popularity.flush()
+        self.assertEqual(
+            [p["id"] for p in typeahead.suggest("shirt", 2)["products"]], [first.pk, second.pk]
+        )
+
+    def test_index_is_built_once_and_kept_current(self):
+        typeahead.suggest("shirt", 5)
+        with self.assertNumQueries(0):
+            typeahead.suggest("shirt", 5)
+
+        hat = self.create_product("Hat")
+        self.assertEqual(typeahead.suggest("ha", 5)["products"], [{"id": hat.pk, "name": "Hat"}])
@@ -0,0 +1,255 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+from django.http import JsonResponse
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .cache import get_redis_client
+
+
+# Refills the bucket for the time since its last request using the Redis
+# clock, so every app server sees the same bucket, then takes one token.
+# Returns {allowed, seconds until a token is available}.
+TOKEN_BUCKET = """
+local rate, capacity = tonumber(ARGV[1]), tonumber(ARGV[2])
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed, wait = 0, (1 - tokens) / rate
+if tokens >= 1 then
+    tokens, allowed, wait = tokens - 1, 1, 0
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+# Takes a request out of the shared in-flight count KEYS[1], unless the count
+# has expired meanwhile, so it never goes below zero.
+LEAVE = """
+if redis.call("EXISTS", KEYS[1]) == 1 then
+    return redis.call("DECR", KEYS[1])
+end
+return 0
+"""
+
+IN_FLIGHT_KEY = "load:in_flight"
+
+_lock = threading.Lock()
+# Least recently used first. A bucket untouched for its period is full again,
+# the same as a missing one, so those are dropped as they reach the front.
+_buckets = OrderedDict()
+_script = None
+
+
+def take_token(key, capacity, period):
+    """
+    Take a token from the bucket `key`, holding `capacity` tokens refilled
+    over `period` seconds. Returns (allowed, seconds to wait). Buckets live
+    in Redis when the cache is Redis, otherwise in a per-process dict.
+    """
+    global _script
+    rate = capacity / period
+    client = get_redis_client()
+    if client is not None:
+        if _script is None:
+            _script = client.register_script(TOKEN_BUCKET)
+        allowed, wait = _script(keys=[key], args=[rate, capacity], client=client)
+        return bool(allowed), float(wait)
+
+    now = time.monotonic()
+    with _lock:
+        tokens, ts, _ = _buckets.pop(key, (capacity, now, period))
+        tokens = min(capacity, tokens + (now - ts) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        _buckets[key] = (tokens, now, period)
+
+        while len(_buckets) > 1:
+            _, last, refill = next(iter(_buckets.values()))
+            if now - last < refill and len(_buckets) <= settings.THROTTLE_LOCAL_MAX_BUCKETS:
+                break
+            _buckets.popitem(last=False)
+    return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+
+def get_scope(view, query_params):
+    """
+    The endpoint class of a request: the view's `throttle_scope`, with
+    catalog requests filtering by `?search=` counted as "search".
+    """
+    scope = getattr(view, "throttle_scope", None) or "default"
+    if scope == "catalog" and query_params.get("search", None):
+        return "search"
+    return scope
+
+
+def parse_rate(rate):
+    """"100/min" -> (100, 60), as DRF's SimpleRateThrottle reads rates."""
+    num, period = rate.split("/")
+    return int(num), {"s": 1, "m": 60, "h": 3600, "d": 86400}[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token-bucket throttle per endpoint class. Scope "catalog" uses the rate
+    DEFAULT_THROTTLE_RATES["catalog<suffix>"], allowing that many requests
+    at once and refilling them evenly over the period. Scopes without a
+    rate are not throttled.
+    """
+
+    suffix = ""
+
+    def get_ident_key(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        scope = get_scope(view, request.query_params) + self.suffix
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope, None)
+        if rate is None:
+            return True
+
+        capacity, period = parse_rate(rate)
+        key = f"throttle:{scope}:{self.get_ident_key(request)}"
+        allowed, self._wait = take_token(key, capacity, period)
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class UserBucketThrottle(TokenBucketThrottle):
+    """Limits each user, or each IP address for anonymous requests."""
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+
+class IPBucketThrottle(TokenBucketThrottle):
+    """Limits each IP address across every user and token it sends."""
+
+    suffix = "_ip"
+
+    def get_ident_key(self, request):
+        return f"ip:{self.get_ident(request)}"
+
+
+class LoadMonitor:
+    """
+    Requests in flight and a per-process moving average of query time. The
+    in-flight count is kept in Redis when the cache is Redis, so it covers
+    every process; otherwise it is per process, which only ever sees more
+    than one request under threaded or async workers.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.db_latency = 0.0
+        self.last_query = 0.0
+        self.script = None
+
+    def enter(self):
+        """Count a request in. Returns the requests in flight, this one included."""
+        client = get_redis_client()
+        if client is not None:
+            # The expiry drops counts left behind by processes that died mid-request.
+            pipe = client.pipeline()
+            pipe.incr(IN_FLIGHT_KEY)
+            pipe.expire(IN_FLIGHT_KEY, settings.LOAD_SHED_IN_FLIGHT_TTL)
+            return pipe.execute()[0]
+        with self.lock:
+            self.in_flight += 1
+            return self.in_flight
+
+    def leave(self):
+        client = get_redis_client()
+        if client is not None:
+            if self.script is None:
+                self.script = client.register_script(LEAVE)
+            self.script(keys=[IN_FLIGHT_KEY], client=client)
+            return
+        with self.lock:
+            self.in_flight -= 1
+
+    def time_query(self, execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            end = time.monotonic()
+            with self.lock:
+                self.db_latency += settings.LOAD_SHED_SMOOTHING * (end - start - self.db_latency)
+                self.last_query = end
+
+    def overloaded(self, in_flight):
+        # A latency average that no query has updated recently is stale.
+        recent = time.monotonic() - self.last_query < settings.LOAD_SHED_WINDOW
+        return in_flight > settings.LOAD_SHED_MAX_IN_FLIGHT or (
+            recent and self.db_latency > settings.LOAD_SHED_DB_LATENCY
+        )
+
+
+monitor = LoadMonitor()
+
+
+def is_authenticated(view, request):
+    """Whether `request` carries credentials one of the view's authenticators accepts."""
+    drf_request = Request(request)
+    for authenticator in view.authentication_classes:
+        try:
+            if authenticator().authenticate(drf_request) is not None:
+                return True
+        except APIException:
+            return False
+    return False
+
+
+class LoadSheddingMiddleware:
+    """
+    Answers anonymous list requests of the LOAD_SHED_SCOPES endpoint classes
+    with 503 and Retry-After while too many requests are in flight or this
+    process's database queries are slow, leaving capacity for carts and
+    checkout. Requests are only checked for valid credentials while shedding.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.in_flight = monitor.enter()
+        try:
+            with connection.execute_wrapper(monitor.time_query):
+                return self.get_response(request)
+        finally:
+            monitor.leave()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view, actions = getattr(view_func, "cls", None), getattr(view_func, "actions", None)
+        if (
+            view is None
+            or not actions
+            or actions.get(request.method.lower(), None) != "list"
+            or get_scope(view, request.GET) not in settings.LOAD_SHED_SCOPES
+            or not monitor.overloaded(request.in_flight)
+            or is_authenticated(view, request)
+        ):
+            return None
+
+        response = JsonResponse(
+            {"detail": "The service is busy, please retry later."}, status=503
+        )
+        response["Retry-After"] = str(settings.LOAD_SHED_RETRY_AFTER)
+        return response
@@ -0,0 +1,306 @@
+import bisect
+import heapq
+import json
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import get_redis_client
+from .models import Category, Product
+
+
+PRODUCT = "product"
+CATEGORY = "category"
+KINDS = (PRODUCT, CATEGORY)
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def get_terms(name):
+    """Every word-aligned suffix of the normalized name, so "red shirt" matches "sh"."""
+    words = normalize(name).split()
+    return sorted({" ".join(words[i:]) for i in range(len(words))})
+
+
+def get_prefixes(name):
+    """The prefixes of every term, up to TYPEAHEAD_PREFIX_LENGTH characters."""
+    length = settings.TYPEAHEAD_PREFIX_LENGTH
+    return sorted({
+        term[:i]
+        for term in get_terms(name)
+        for i in range(1, min(len(term), length) + 1)
+        if not term[:i].endswith(" ")
+    })
+
+
+def get_score(trending):
+    """
+    The log of `trending` scaled back up by the decay since the epoch. Decay
+    scales every product alike, so these scores rank products read at
+    different times as if read together and never need rewriting for it.
+    """
+    if trending <= 0:
+        return float("-inf")
+    return math.log(trending) + time.time() * math.log(2) / settings.POPULARITY_HALF_LIFE
+
+
+def product_doc(product):
+    return {
+        "type": PRODUCT,
+        "id": product.id,
+        "name": product.name,
+        "score": get_score(product.trending),
+    }
+
+
+def category_doc(category, score=0):
+    return {"type": CATEGORY, "id": category.id, "name": category.name, "score": score}
+
+
+def load_docs():
+    products = Product.objects.filter(is_available=True).only("id", "name", "trending")
+    categories = Category.objects.annotate(
+        score=Count("product", filter=Q(product__is_available=True))
+    )
+    return [product_doc(product) for product in products.iterator()] + [
+        category_doc(category, category.score) for category in categories.iterator()
+    ]
+
+
+def rank(docs, limit):
+    by_kind = {kind: [] for kind in KINDS}
+    for doc in docs:
+        by_kind[doc["type"]].append(doc)
+
+    results = {}
+    for kind, kind_docs in by_kind.items():
+        top = heapq.nsmallest(limit, kind_docs, key=lambda doc: (-doc["score"], doc["name"]))
+        results[kind] = [{"id": doc["id"], "name": doc["name"]} for doc in top]
+    return {"products": results[PRODUCT], "categories": results[CATEGORY]}
+
+
+class RedisIndex:
+    """
+    A sorted set per kind and prefix, "typeahead:type:prefix", holding the ids
+    of the documents with a term starting with it scored by popularity, and
+    the documents in a hash keyed by "type:id". Prefixes stop at
+    TYPEAHEAD_PREFIX_LENGTH characters; longer queries filter the top
+    TYPEAHEAD_CANDIDATES documents of their truncated prefix.
+    """
+
+    DOCS = "typeahead:docs"
+    KEYS = "typeahead:keys"
+
+    def __init__(self, client):
+        self.client = client
+
+    def prefix_key(self, kind, prefix):
+        return f"typeahead:{kind}:{prefix}"
+
+    def add(self, doc):
+        self.add_many([doc])
+
+    def add_many(self, docs):
+        """Index `docs`, moving them off the prefixes of their previous names."""
+        if not docs:
+            return
+        olds = self.client.hmget(self.DOCS, [f"{doc['type']}:{doc['id']}" for doc in docs])
+
+        pipe = self.client.pipeline()
+        for doc, old in zip(docs, olds):
+            prefixes = get_prefixes(doc["name"])
+            if old is not None:
+                stale = set(get_prefixes(json.loads(old)["name"])) - set(prefixes)
+                for prefix in stale:
+                    pipe.zrem(self.prefix_key(doc["type"], prefix), doc["id"])
+
+            keys = [self.prefix_key(doc["type"], prefix) for prefix in prefixes]
+            for key in keys:
+                pipe.zadd(key, {doc["id"]: doc["score"]})
+            if keys:
+                pipe.sadd(self.KEYS, *keys)
+            pipe.hset(self.DOCS, f"{doc['type']}:{doc['id']}", json.dumps(doc))
+        pipe.execute()
+
+    def remove(self, kind, pk):
+        key = f"{kind}:{pk}"
+        old = self.client.hget(self.DOCS, key)
+        if old is None:
+            return
+
+        pipe = self.client.pipeline()
+        for prefix in get_prefixes(json.loads(old)["name"]):
+            pipe.zrem(self.prefix_key(kind, prefix), pk)
+        pipe.hdel(self.DOCS, key)
+        pipe.execute()
+
+    def rebuild(self, docs):
+        sets, stored = defaultdict(dict), {}
+        for doc in docs:
+            for prefix in get_prefixes(doc["name"]):
+                sets[self.prefix_key(doc["type"], prefix)][doc["id"]] = doc["score"]
+            stored[f"{doc['type']}:{doc['id']}"] = json.dumps(doc)
+
+        old_keys = self.client.smembers(self.KEYS)
+        pipe = self.client.pipeline()
+        pipe.delete(self.DOCS, self.KEYS, *old_keys)
+        for key, members in sets.items():
+            pipe.zadd(key, members)
+        if sets:
+            pipe.sadd(self.KEYS, *sets)
+            pipe.hset(self.DOCS, mapping=stored)
+        pipe.execute()
+
+    def search(self, prefix, limit):
+        length = settings.TYPEAHEAD_PREFIX_LENGTH
+        count = limit if len(prefix) <= length else settings.TYPEAHEAD_CANDIDATES
+
+        pipe = self.client.pipeline()
+        for kind in KINDS:
+            pipe.zrevrange(self.prefix_key(kind, prefix[:length]), 0, count - 1)
+        keys = [
+            f"{kind}:{pk.decode()}"
+            for kind, ids in zip(KINDS, pipe.execute())
+            for pk in ids
+        ]
+        docs = self.client.hmget(self.DOCS, keys) if keys else []
+        docs = [json.loads(doc) for doc in docs if doc is not None]
+        if len(prefix) > length:
+            docs = [
+                doc for doc in docs
+                if any(term.startswith(prefix) for term in get_terms(doc["name"]))
+            ]
+        return rank(docs, limit)
+
+
+class LocalIndex:
+    """
+    Per-process sorted array of (term, key) pairs, for when the cache is not
+    Redis, i.e. a single-process server. It is built on first use and kept
+    current by this process's signals; `rebuild` reloads it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.terms = []
+        self.docs = {}
+        self.built = False
+
+    def ensure_built(self):
+        if self.built:
+            return
+        with self.build_lock:
+            if not self.built:
+                self.rebuild(load_docs())
+
+    def _remove(self, key):
+        doc = self.docs.pop(key, None)
+        if doc is None:
+            return
+        for term in doc["terms"]:
+            i = bisect.bisect_left(self.terms, (term, key))
+            if i < len(self.terms) and self.terms[i] == (term, key):
+                del self.terms[i]
+
+    def add(self, doc):
+        self.add_many([doc])
+
+    def add_many(self, docs):
+        if not self.built:
+            return
+        with self.lock:
+            for doc in docs:
+                key = (doc["type"], doc["id"])
+                self._remove(key)
+                doc = {**doc, "terms": get_terms(doc["name"])}
+                for term in doc["terms"]:
+                    bisect.insort(self.terms, (term, key))
+                self.docs[key] = doc
+
+    def remove(self, kind, pk):
+        with self.lock:
+            self._remove((kind, pk))
+
+    def rebuild(self, docs):
+        terms, stored = [], {}
+        for doc in docs:
+            key = (doc["type"], doc["id"])
+            stored[key] = {**doc, "terms": get_terms(doc["name"])}
+            terms.extend((term, key) for term in stored[key]["terms"])
+        terms.sort()
+
+        with self.lock:
+            self.terms, self.docs, self.built = terms, stored, True
+
+    def search(self, prefix, limit):
+        self.ensure_built()
+        with self.lock:
+            i = bisect.bisect_left(self.terms, (prefix,))
+            keys = {}
+            while i < len(self.terms) and self.terms[i][0].startswith(prefix):
+                keys.setdefault(self.terms[i][1], None)
+                i += 1
+            docs = [self.docs[key] for key in keys]
+        return rank(docs, limit)
+
+
+_local_index = LocalIndex()
+
+
+def get_index():
+    client = get_redis_client()
+    return _local_index if client is None else RedisIndex(client)
+
+
+def suggest(query, limit):
+    prefix = normalize(query)
+    if not prefix:
+        return {"products": [], "categories": []}
+    return get_index().search(prefix, limit)
+
+
+def rebuild():
+    get_index().rebuild(load_docs())
+
+
+def refresh_scores(product_ids):
+    """Re-score products whose `trending` was changed by an UPDATE, which sends no signals."""
+    products = Product.objects.filter(pk__in=product_ids, is_available=True).only(
+        "id", "name", "trending"
+    )
+    get_index().add_many([product_doc(product) for product in products])
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    if instance.is_available:
+        get_index().add(product_doc(instance))
+    else:
+        get_index().remove(PRODUCT, instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def index_category(sender, instance, created, **kwargs):
+    score = 0
+    if not created:
+        score = instance.product_set.filter(is_available=True).count()
+    get_index().add(category_doc(instance, score))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+def unindex(sender, instance, **kwargs):
+    get_index().remove(PRODUCT if sender is Product else CATEGORY, instance.pk)
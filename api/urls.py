@@ -11,8 +11,10 @@ router.register("api/categories", views.CategoryViewSet)
 router.register("api/images", views.ImageViewSet)
 router.register("api/orders", views.OrderViewSet, basename="orders")
 router.register("api/order-items", views.OrderItemViewSet)
+router.register("api/cart", views.CartItemViewSet, basename="cart")
 router.register("api/reviews", views.ReviewViewSet)
 router.register("api/sizes", views.SizeViewSet)
+router.register("api/suggestions", views.SuggestionViewSet, basename="suggestions")
 
 
 urlpatterns = [
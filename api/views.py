@@ -1,16 +1,38 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.http import Http404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.viewsets import GenericViewSet, ModelViewSet, ViewSet
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.serializers import ValidationError
 
+from api.analytics import vendor_report
+from api.archive import MergedOrders, get_cutoff
+from api.cache import cache_products, cached_list, get_cached_products, product_key, single_flight
+from api.carts import CartMixin
+from api.fastpath import ValuesListMixin, ValuesSerializer
+from api.idempotency import IdempotentCreateMixin
+from api.provisioning import provision_users
+from api.renderers import FastJSONRenderer, decode, get_raw_results
+from api import listing, outbox, popularity, stock, typeahead
 from api.models import (
+    ArchivedOrder,
     Category,
     Image,
     Order,
     OrderItem,
     Product,
+    ProductListing,
+    RelatedProduct,
     Review,
     Size,
     User,
@@ -22,9 +44,12 @@ from api.permissions import (
     IsVendor,
     IsAVendor,
     IsUser,
+    IsVendorOwner,
+    get_vendor_ids,
 )
 
 from api.serializers import (
+    CartItemSerializer,
     CategorySerializer,
     VendorSerializer,
     ImageSerializer,
@@ -33,6 +58,7 @@ from api.serializers import (
     ProductSerializer,
     ReviewSerializer,
     SizeSerializer,
+    StockChangeSerializer,
     UserSerializer,
 )
 
@@ -56,6 +82,21 @@ def get_parent(query_params, queryset):
             }
         )
 
+def get_date(query_params, name, default):
+    value = query_params.get(name, None)
+    if not value: return default
+
+    try:
+        date = parse_date(value)
+    except ValueError:
+        date = None
+    if date is None:
+        raise ValidationError(
+            {name: ["Date has wrong format. Use one of these formats instead: YYYY-MM-DD."]}
+        )
+    return date
+
+
 class UserViewSet(ModelViewSet):
     queryset = User.objects.filter(is_active=True)
     serializer_class = UserSerializer
@@ -78,6 +119,19 @@ class UserViewSet(ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(password=make_password(serializer.validated_data["password"]))
 
+    @action(detail=False, methods=["post"], url_path="import")
+    def import_users(self, request):
+        if not isinstance(request.data, list): raise ValidationError({
+                "non_field_errors": [f'Expected a list of items but got type "{type(request.data).__name__}".']
+            })
+        if len(request.data) > settings.USER_IMPORT_MAX: raise ValidationError({
+                "non_field_errors": [f"Ensure this list has no more than {settings.USER_IMPORT_MAX} items."]
+            })
+
+        # At most USER_IMPORT_MAX passwords, hashed without a process pool.
+        report = provision_users(request.data, workers=1)
+        return Response(report)
+
     def get_permissions(self):
         if self.action == "create":
             return (permissions.AllowAny(),)
@@ -85,22 +139,134 @@ class UserViewSet(ModelViewSet):
         if self.action == "retrieve":
             return (permissions.OR(IsUser(), permissions.IsAdminUser()),)
 
-        if self.action == "list":
+        if self.action in ("list", "import_users"):
             return (permissions.IsAdminUser(),)
         return (IsUser(),)
 
 
 class ProductViewSet(ModelViewSet):
-    queryset = Product.objects.filter(is_available=True)
+    queryset = Product.objects.filter(is_available=True).select_related(
+        "category", "vendor"
+    )
     serializer_class = ProductSerializer
+    values_serializer = ValuesSerializer(ProductSerializer)
     filterset_fields = ["id", "name", "category", "vendor", "is_available", "price", "featured"]
-    ordering_fields = ["datetime_created", "name", "reviews", "stars"]
+    ordering_fields = ["datetime_created", "name", "reviews", "stars", "views", "trending"]
+    cache_max_age = {"list": 60, "retrieve": 60, "batch": 60, "related": 60 * 10}
+    throttle_scope = "catalog"
+
+    @cached_list
+    def list(self, request, *args, **kwargs):
+        # Served from the denormalized `ProductListing` rows, without joins.
+        queryset = listing.values(
+            self.filter_queryset(ProductListing.objects.filter(is_available=True))
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(listing.represent(page))
+        return Response(listing.represent(queryset))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # Only FastJSONRenderer writes the `RawJSON` rows of `list` as they are.
+        renderer = getattr(request, "accepted_renderer", None)
+        data = getattr(response, "data", None)
+        if not isinstance(renderer, FastJSONRenderer) and get_raw_results(data) is not None:
+            response.data = decode(data)
+        return response
+
+    def retrieve(self, request, pk=None, *args, **kwargs):
+        if not pk.isdigit(): raise Http404
+        data = single_flight(
+            product_key(int(pk)),
+            lambda: super(ProductViewSet, self).retrieve(request, pk=pk, *args, **kwargs).data,
+            settings.PRODUCT_CACHE_TTL,
+        )
+
+        popularity.record(data["id"], popularity.VIEWS)
+        return Response(data)
+
+    @action(detail=False, methods=["get"])
+    def batch(self, request):
+        ids = request.query_params.get("ids", "")
+        ids = list(dict.fromkeys(pk.strip() for pk in ids.split(",") if pk.strip()))
+
+        if not ids or not all(pk.isdigit() for pk in ids): raise ValidationError({
+                "ids": ["Expected a comma-separated list of product ids."]
+            })
+        if len(ids) > settings.PRODUCT_BATCH_MAX: raise ValidationError({
+                "ids": [f"Ensure this list has no more than {settings.PRODUCT_BATCH_MAX} ids."]
+            })
+
+        ids = [int(pk) for pk in ids]
+        products = self.get_products(ids)
+        return Response({
+            "results": [products[pk] for pk in ids if pk in products],
+            "not_found": [pk for pk in ids if pk not in products],
+        })
+
+    @action(detail=True, methods=["get"])
+    def related(self, request, pk=None):
+        if not pk.isdigit(): raise Http404
+        ids = list(
+            RelatedProduct.objects.filter(product=pk)
+            .order_by("rank")
+            .values_list("related", flat=True)
+        )
+        products = self.get_products(ids)
+        return Response([products[pk] for pk in ids if pk in products])
+
+    @action(detail=False, methods=["post"])
+    def stock(self, request):
+        if isinstance(request.data, list) and len(request.data) > settings.STOCK_SYNC_MAX: raise ValidationError({
+                "non_field_errors": [f"Ensure this list has no more than {settings.STOCK_SYNC_MAX} items."]
+            })
+
+        serializer = StockChangeSerializer(data=request.data, many=True, allow_empty=False)
+        serializer.is_valid(raise_exception=True)
+
+        changes = {}
+        for change in serializer.validated_data:
+            product = change.pop("product")
+            if product in changes: raise ValidationError({
+                    "product": [f"Product {product} appears more than once."]
+                })
+            changes[product] = change
+
+        owners = stock.get_owners(changes)
+        missing = [pk for pk in changes if pk not in owners]
+        if missing: raise ValidationError({
+                "product": [f'Invalid pk "{pk}" - object does not exist.' for pk in missing]
+            })
+
+        vendor_ids = get_vendor_ids(request)
+        foreign = sorted(pk for pk, (vendor_id, _) in owners.items() if vendor_id not in vendor_ids)
+        if foreign:
+            raise PermissionDenied(f"You do not own products {', '.join(map(str, foreign))}.")
+
+        rows = stock.apply_stock(
+            changes, {pk: is_available for pk, (_, is_available) in owners.items()}
+        )
+        return Response({"results": rows})
+
+    def get_products(self, ids):
+        """Serialized products by id, from the per-object cache where possible."""
+        products = get_cached_products(ids)
+        misses = [pk for pk in ids if pk not in products]
+
+        if misses:
+            fetched = self.values_serializer.serialize(
+                self.get_queryset().filter(pk__in=misses)
+            )
+            cache_products(fetched)
+            products.update((data["id"], data) for data in fetched)
+        return products
 
     def get_permissions(self):
-        if self.action == "create":
+        if self.action in ("create", "stock"):
             return (IsAVendor(),)
 
-        if self.action in ("list", "retrieve"):
+        if self.action in ("list", "retrieve", "batch", "related"):
             return (permissions.AllowAny(),)
 
         if self.action == "destroy":
@@ -134,10 +300,12 @@ class ProductViewSet(ModelViewSet):
         return super().filter_queryset(get_parent(self.request.query_params, queryset))
 
 
-class SizeViewSet(ModelViewSet):
-    queryset = Size.objects.all()
+class SizeViewSet(ValuesListMixin, ModelViewSet):
+    queryset = Size.objects.select_related("product")
     serializer_class = SizeSerializer
+    values_serializer = ValuesSerializer(SizeSerializer)
     filterset_fields = ["id", "name", "product"]
+    throttle_scope = "catalog"
 
     def get_permissions(self):
         if self.action in ("list", "retrieve"):
@@ -147,9 +315,11 @@ class SizeViewSet(ModelViewSet):
 
 class ImageViewSet(ModelViewSet):
 
-    queryset = Image.objects.all()
+    queryset = Image.objects.select_related("product")
     serializer_class = ImageSerializer
     filterset_fields = ["id", "product"]
+    cache_max_age = {"list": 60 * 10, "retrieve": 60 * 10}
+    throttle_scope = "catalog"
 
     def get_permissions(self):
         if self.action in ("list", "retrieve"):
@@ -166,6 +336,12 @@ class CategoryViewSet(ModelViewSet):
     serializer_class = CategorySerializer
     filterset_fields = ["id", "name"]
     ordering_fields = ["name"]
+    cache_max_age = {"list": 60 * 10, "retrieve": 60 * 10}
+    throttle_scope = "catalog"
+
+    @cached_list
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
     def get_permissions(self):
         if self.action in ("list", "retrieve"):
@@ -181,6 +357,7 @@ class VendorViewSet(ModelViewSet):
     serializer_class = VendorSerializer
     filterset_fields = ["id", "name", "user"]
     ordering_fields = ["datetime_created", "name"]
+    throttle_scope = "catalog"
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -189,31 +366,75 @@ class VendorViewSet(ModelViewSet):
             user.is_vendor = True
             user.save()
 
+    @action(detail=True, methods=["get"])
+    def analytics(self, request, pk=None):
+        vendor = self.get_object()
+        end = get_date(request.query_params, "end", timezone.localdate())
+        start = get_date(request.query_params, "start", end - timedelta(days=29))
+        top = request.query_params.get("top", "10")
+
+        if not top.isdigit(): raise ValidationError({
+                "top": [f"Expected value of type int got {type(top)}"]
+            })
+        if start > end: raise ValidationError({
+                "start": ["Start date must not be after the end date."]
+            })
+        return Response(vendor_report(vendor, start, end, top=int(top)))
+
     def get_permissions(self):
         if self.action in ("list", "retrieve"):
             return (permissions.AllowAny(),)
         elif self.action == "create":
             return (permissions.IsAuthenticated(),)
+        elif self.action == "analytics":
+            return (permissions.OR(IsVendorOwner(), permissions.IsAdminUser()),)
         return (permissions.OR(IsUser(), permissions.IsAdminUser()),)
 
 
-class OrderItemViewSet(ModelViewSet):
+class OrderItemViewSet(IdempotentCreateMixin, ModelViewSet):
     serializer_class = OrderItemSerializer
     queryset = OrderItem.objects.all()
     filterset_fields = ["id", "user", "product"]
+    throttle_scope = "cart"
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        item = serializer.save(user=self.request.user)
+        popularity.record(item.product_id, popularity.CART_ADDS)
 
     def get_permissions(self):
         return (permissions.OR(permissions.IsAdminUser(), IsUser()),)
 
 
-class ReviewViewSet(ModelViewSet):
+class SuggestionViewSet(ViewSet):
+    permission_classes = (permissions.AllowAny,)
+    throttle_scope = "suggest"
+
+    def list(self, request):
+        query = request.query_params.get("q", "")
+        limit = request.query_params.get("limit", "5")
+
+        if not limit.isdigit() or not 1 <= int(limit) <= settings.TYPEAHEAD_MAX_LIMIT:
+            raise ValidationError({
+                "limit": [f"Expected an int between 1 and {settings.TYPEAHEAD_MAX_LIMIT}."]
+            })
+        return Response(typeahead.suggest(query[:100], int(limit)))
+
+
+class CartItemViewSet(IdempotentCreateMixin, CartMixin, GenericViewSet):
+    serializer_class = CartItemSerializer
+    throttle_scope = "cart"
+
+    def get_permissions(self):
+        return (IsUser(),)
+
+
+class ReviewViewSet(ValuesListMixin, ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    values_serializer = ValuesSerializer(ReviewSerializer)
     filterset_fields = ["id", "stars", "user", "product"]
     ordering_fields = ["datetime_created", "stars"]
+    throttle_scope = "catalog"
 
 
     def perform_create(self, serializer):
@@ -228,11 +449,17 @@ class ReviewViewSet(ModelViewSet):
         return (permissions.OR(IsUser(), permissions.IsAdminUser()),)
 
 
-class OrderViewSet(ModelViewSet):
+class OrderViewSet(IdempotentCreateMixin, ModelViewSet):
     serializer_class = OrderSerializer
-    queryset = Order.objects.all()
+    queryset = Order.objects.with_totals().prefetch_related("items")
     filterset_fields = ["id", "user", "completed"]
-    ordering_fields = ["datetime_created"]
+    ordering_fields = ["datetime_created", "total"]
+
+    def get_throttles(self):
+        # Only placing an order counts against "checkout", not order history.
+        if self.action == "create":
+            self.throttle_scope = "checkout"
+        return super().get_throttles()
 
     def update(self, request, *args, **kwargs):
         return Response(
@@ -246,8 +473,72 @@ class OrderViewSet(ModelViewSet):
             status=status.HTTP_405_METHOD_NOT_ALLOWED,
         )
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        # Completed orders past ORDER_ARCHIVE_AFTER live in the archive, which
+        # is only read when the requested date range reaches back that far.
+        after = get_date(request.query_params, "created_after", None)
+        before = get_date(request.query_params, "created_before", None)
+        if (after or before) and (after is None or after <= timezone.localdate(get_cutoff())):
+            archived = self.filter_queryset(
+                ArchivedOrder.objects.with_totals().prefetch_related("items")
+            )
+            queryset = MergedOrders(
+                [queryset, archived], queryset.query.order_by or ["-datetime_created"]
+            )
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    def retrieve(self, request, pk=None, *args, **kwargs):
+        try:
+            return super().retrieve(request, pk=pk, *args, **kwargs)
+        except Http404:
+            instance = get_object_or_404(
+                ArchivedOrder.objects.with_totals().prefetch_related("items"), pk=pk
+            )
+            self.check_object_permissions(request, instance)
+            return Response(self.get_serializer(instance).data)
+
+    def filter_queryset(self, queryset):
+        total_gte = self.request.query_params.get("total_gte", None)
+        total_lte = self.request.query_params.get("total_lte", None)
+        created_after = get_date(self.request.query_params, "created_after", None)
+        created_before = get_date(self.request.query_params, "created_before", None)
+
+        if total_gte:
+            if not total_gte.isdigit(): raise ValidationError({
+                    "total_gte": [
+                        f"Expected value of type int got {type(total_gte)}"
+                    ]
+                })
+            queryset = queryset.filter(total__gte=total_gte)
+
+        if total_lte:
+            if not total_lte.isdigit(): raise ValidationError({
+                    "total_lte": [
+                        f"Expected value of type int got {type(total_lte)}"
+                    ]
+                })
+            queryset = queryset.filter(total__lte=total_lte)
+
+        if created_after:
+            queryset = queryset.filter(datetime_created__date__gte=created_after)
+        if created_before:
+            queryset = queryset.filter(datetime_created__date__lte=created_before)
+
+        return super().filter_queryset(queryset)
+
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        order = serializer.save(user=self.request.user)
+        outbox.publish(
+            outbox.ORDER_CREATED,
+            {"order": str(order.id), "user": str(self.request.user.pk)},
+        )
 
     def get_permissions(self):
         if self.action == "create":
@@ -0,0 +1,72 @@
+import logging
+import re
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .models import Product
+
+
+logger = logging.getLogger(__name__)
+
+# The request line and status of common and combined format access logs.
+LOG_LINE = re.compile(r'"GET (?P<url>/api/\S*) HTTP/[\d.]+" (?P<status>\d{3}) ')
+
+
+def get_logged_urls(lines, top=50):
+    """The `top` most requested /api/ URLs answered with 200 in access log `lines`."""
+    counts = Counter()
+    for line in lines:
+        match = LOG_LINE.search(line)
+        if match and match["status"] == "200":
+            counts[match["url"]] += 1
+    return [url for url, _ in counts.most_common(top)]
+
+
+def warm_urls(urls, origin=None, host=None, concurrency=None):
+    """
+    GET `urls` anonymously from the app server at `origin`, sending `host`
+    as the Host header, at most `concurrency` at a time. Returns
+    [(url, status, seconds)], with status None when the request failed.
+    """
+    origin = (origin or settings.CACHE_WARM_ORIGIN).rstrip("/")
+    host = host or settings.CACHE_WARM_HOST
+    concurrency = concurrency or settings.CACHE_WARM_CONCURRENCY
+
+    def get(url):
+        start = time.perf_counter()
+        request = urllib.request.Request(origin + url, headers={"Host": host})
+        try:
+            with urllib.request.urlopen(request, timeout=settings.CACHE_WARM_TIMEOUT) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except OSError as e:
+            logger.warning("Could not warm %s: %s", url, e)
+            status = None
+        return url, status, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(get, urls))
+
+
+def warm_products(specs=None):
+    """Fill the per-object product cache from CACHE_WARM_PRODUCTS specs. Returns the products."""
+    from .views import ProductViewSet
+
+    ids = []
+    for spec in settings.CACHE_WARM_PRODUCTS if specs is None else specs:
+        queryset = Product.objects.filter(is_available=True, **spec.get("filter", {}))
+        ids.extend(
+            queryset.order_by(*spec.get("order_by", ["pk"])).values_list("id", flat=True)[
+                : spec.get("limit", 100)
+            ]
+        )
+    ids = list(dict.fromkeys(ids))
+    ProductViewSet().get_products(ids)
+    return len(ids)